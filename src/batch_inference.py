@@ -0,0 +1,259 @@
+"""This script scores many input files or one large feature matrix with the saved model
+in a process pool. The model and feature buffers live in shared memory, so workers never
+read model.pkl or receive pickled rows themselves. Rows are checked with the model's
+RowValidator first and rejected rows are not scored"""
+
+import os
+import sys
+import pickle
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import click
+from threadpoolctl import threadpool_limits
+
+from data_training import load_model
+from row_validation import RowValidator, fill_rejected
+from resources import stage_limits
+
+sys.path.append("src")
+
+MODEL_PATH = "data/model/model.pkl"
+
+# Arrays the worker processes see, attached once per process by _attach_worker
+_worker_arrays = {}
+_worker_state = {}
+
+
+def _pack(arrays: dict):
+    """Copies named arrays into one shared memory block
+
+    Args:
+        arrays (dict): Arrays to share
+
+    Returns:
+        tuple: (shared memory block, layout) where layout lets workers rebuild the views
+    """
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        offset = -(-offset // 64) * 64
+        layout[name] = (offset, array.dtype.str, array.shape)
+        offset += array.nbytes
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for name, array in arrays.items():
+        start, dtype, shape = layout[name]
+        np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)[...] = array
+    return shm, layout
+
+
+def _attach_worker(shm_name: str, layout: dict, state: dict):
+    """Process pool initializer that maps the shared arrays into the worker
+
+    Args:
+        shm_name (str): Name of the shared memory block
+        layout (dict): Layout returned by _pack
+        state (dict): Small read-only settings such as the feature names, the row
+            validator and the threads per worker
+    """
+    threadpool_limits(limits=state["threads"])
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_state.update(state, shm=shm)
+    for name, (start, dtype, shape) in layout.items():
+        _worker_arrays[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)
+    # Rebuilt from the shared bytes once per process, model.pkl is never read here. The
+    # unpickle is a one-off, and sklearn's compiled predict beats walking the shared tree
+    # arrays in numpy on every block
+    _worker_state["model"] = pickle.loads(_worker_arrays["model_pickle"])
+
+
+def _predict_indices(X: np.ndarray) -> np.ndarray:
+    """Predicts class indices for a float32 block of rows in a worker"""
+    if len(X) == 0:
+        return np.empty(0, dtype=np.int64)
+    model = _worker_state["model"]
+    predictions = model.predict(pd.DataFrame(X, columns=_worker_state["features"], copy=False))
+    return np.searchsorted(model.classes_, predictions)
+
+
+def _score_rows(start: int, stop: int) -> int:
+    """Worker task: predicts rows [start, stop) of the shared matrix into the output"""
+    _worker_arrays["output"][start:stop] = _predict_indices(_worker_arrays["X"][start:stop])
+    return stop - start
+
+
+def _score_file(path: str, output_dir: str) -> tuple:
+    """Worker task: scores one csv file and writes its predictions next to the others
+
+    Rejected rows get REJECTED_LABEL as prediction and are also written, with the
+    reason, to `<name>_rejected.csv`.
+    """
+    data = pd.read_csv(path)
+    accepted, rejected, rejected_mask = _worker_state["validator"].split(data, return_mask=True)
+    X = np.ascontiguousarray(accepted.to_numpy(dtype=np.float32))
+    predictions = fill_rejected(_worker_arrays["classes"][_predict_indices(X)], rejected_mask)
+    name = os.path.splitext(os.path.basename(path))[0]
+    output_path = os.path.join(output_dir, f"{name}_pred.csv")
+    pd.DataFrame({"prediction": predictions}).to_csv(output_path, index=False)
+    if len(rejected):
+        rejected.to_csv(os.path.join(output_dir, f"{name}_rejected.csv"), index=False)
+    return path, output_path, len(data), len(rejected)
+
+
+def _shared_model(model, validator: RowValidator, extra: dict = None):
+    """Places the pickled model and any extra arrays in one shared memory block
+
+    Args:
+        model (object): Trained machine learning model.
+        validator (RowValidator): Validator of the model's inputs.
+        extra (dict, optional): Additional arrays to share. Defaults to None.
+
+    Returns:
+        tuple: (shared memory block, layout, worker state)
+    """
+    arrays = {
+        "classes": np.asarray(model.classes_),
+        "model_pickle": np.frombuffer(pickle.dumps(model), dtype=np.uint8),
+        **(extra or {}),
+    }
+    shm, layout = _pack(arrays)
+    _, threads = stage_limits("inference")
+    state = {"features": validator.columns, "validator": validator, "threads": threads}
+    return shm, layout, state
+
+
+def _in_order(executor, tasks, max_in_flight: int):
+    """Submits tasks with a bounded number in flight and yields results in order
+
+    Args:
+        executor (ProcessPoolExecutor): The pool
+        tasks (iterable): (function, args) pairs
+        max_in_flight (int): Maximum number of submitted but unconsumed tasks
+
+    Yields:
+        object: Task results in submission order
+    """
+    pending = deque()
+    for function, args in tasks:
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+        pending.append(executor.submit(function, *args))
+    while pending:
+        yield pending.popleft().result()
+
+
+def predict_array(
+    X: pd.DataFrame,
+    model,
+    n_workers: int = None,
+    chunk_rows: int = 100_000,
+    validator: RowValidator = None,
+) -> np.ndarray:
+    """
+    Predict a large feature matrix in parallel chunks.
+
+    The rows that pass the validator are copied once into shared memory as float32 and
+    workers write class indices straight into a shared output buffer, so no rows are
+    pickled.
+
+    Args:
+        X (pd.DataFrame): Features in any column order.
+        model (object): Trained machine learning model.
+        n_workers (int, optional): Number of worker processes. Defaults to the limit of
+            the inference stage in resources.py.
+        chunk_rows (int, optional): Rows per task. Defaults to 100_000.
+        validator (RowValidator, optional): Validator of the model's inputs, e.g. from
+            `RowValidator.load(model_path)`. Defaults to one that only checks the
+            model's training columns.
+
+    Returns:
+        np.ndarray: Predicted labels for every row, REJECTED_LABEL for rejected rows.
+    """
+    validator = validator or RowValidator.from_model(model)
+    accepted, _, rejected_mask = validator.split(X, return_mask=True)
+    features = np.ascontiguousarray(accepted.to_numpy(dtype=np.float32))
+    output = np.zeros(len(features), dtype=np.int64)
+    shm, layout, state = _shared_model(model, validator, {"X": features, "output": output})
+    try:
+        n_workers = n_workers or stage_limits("inference")[0]
+        with ProcessPoolExecutor(
+            n_workers, initializer=_attach_worker, initargs=(shm.name, layout, state)
+        ) as executor:
+            tasks = (
+                (_score_rows, (start, min(start + chunk_rows, len(features))))
+                for start in range(0, len(features), chunk_rows)
+            )
+            for _ in _in_order(executor, tasks, max_in_flight=2 * n_workers):
+                pass
+        start, dtype, shape = layout["output"]
+        indices = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    return fill_rejected(np.asarray(model.classes_)[indices], rejected_mask)
+
+
+def score_files(
+    paths: list, output_dir: str, model_path: str = MODEL_PATH, n_workers: int = None
+):
+    """
+    Score many csv files in parallel, yielding results in input order.
+
+    At most two files per worker are queued at a time, so a slow consumer holds back
+    submission instead of letting finished results pile up in memory.
+
+    Args:
+        paths (list): Csv files with the model features (a quality column is ignored).
+        output_dir (str): Folder the `<name>_pred.csv` files are written to.
+        model_path (str, optional): Path to the saved model file. Defaults to MODEL_PATH.
+        n_workers (int, optional): Number of worker processes. Defaults to the limit of
+            the inference stage in resources.py.
+
+    Yields:
+        tuple: (input path, output path, number of rows, number of rejected rows) for
+            every file, in order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    model = load_model(model_path)
+    shm, layout, state = _shared_model(model, RowValidator.load(model_path, model))
+    try:
+        n_workers = n_workers or stage_limits("inference")[0]
+        with ProcessPoolExecutor(
+            n_workers, initializer=_attach_worker, initargs=(shm.name, layout, state)
+        ) as executor:
+            tasks = ((_score_file, (path, output_dir)) for path in paths)
+            yield from _in_order(executor, tasks, max_in_flight=2 * n_workers)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+@click.command()
+@click.argument("paths", nargs=-1, required=True)
+@click.option("--model_path", type=str, default=MODEL_PATH, help="Model file path")
+@click.option("--output_dir", type=str, help="Folder for the prediction files")
+@click.option("--n_workers", type=int, default=None, help="Number of worker processes")
+def main(paths, model_path, output_dir, n_workers):
+    """
+    Main function to score csv shards in parallel with the saved model.
+
+    Args:
+        paths (tuple): Csv files to score.
+        model_path (str): Path to the saved model file.
+        output_dir (str): Folder for the prediction files.
+        n_workers (int): Number of worker processes.
+    """
+    total = rejected = 0
+    for path, output_path, n_rows, n_rejected in score_files(
+        paths, output_dir, model_path, n_workers
+    ):
+        total += n_rows
+        rejected += n_rejected
+        print(f"Scored {n_rows} rows of '{path}' into '{output_path}', {n_rejected} rejected.")
+    print(f"Scored {total} rows from {len(paths)} files, {rejected} rejected.")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,17 +2,29 @@
 stores it on a raw folder"""
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 import click
 import pandas as pd
 from ucimlrepo import fetch_ucirepo
 
+from raw_store import RawStore
 
-def create_data_folder(data_dir: str) -> str:
+# File name used inside each per-dataset folder in batch mode
+BATCH_FILE_NAME = "combined.csv"
+
+# Downloads wait on the network rather than the CPU, so their thread pool is not
+# sized from the CPU budget in resources.py
+DOWNLOAD_WORKERS = 8
+
+
+def create_data_folder(data_dir: str, file_name: str = "wine_quality_combined.csv") -> str:
     """This is a helper function that creates the data directory for the csv file
 
     Args:
         data_dir (str): The data directory for the data, typically the data directory
+        file_name (str, optional): Name of the csv file inside the directory.
+            Defaults to "wine_quality_combined.csv".
 
     Raises:
         OsError: When the directory was not created succcessfully
@@ -21,7 +33,7 @@ def create_data_folder(data_dir: str) -> str:
         str: the fule file_path for the data that will be downloaded
     """
 
-    csv_file_path = os.path.join(data_dir, "wine_quality_combined.csv")
+    csv_file_path = os.path.join(data_dir, file_name)
 
     try:
         # Ensure the directory exists
@@ -37,6 +49,29 @@ def create_data_folder(data_dir: str) -> str:
     return csv_file_path
 
 
+def fetch_data(data_id: int = 186) -> pd.DataFrame:
+    """Fetches a dataset from UCI with its features and targets in one DataFrame
+
+    Args:
+        data_id (int, optional): Data Id for the dataset we are using. Defaults to 186.
+
+    Returns:
+        pd.DataFrame: The features followed by the target columns
+    """
+    if isinstance(data_id, str):
+        data_id = int(data_id)
+
+    # Fetch the dataset
+    wine_quality = fetch_ucirepo(id=data_id)
+
+    # Features (X) and Targets (y)
+    X = wine_quality.data.features
+    y = wine_quality.data.targets
+
+    # Combine features and targets into a single DataFrame
+    return pd.concat([X, y], axis=1)
+
+
 def download_data(file_path: str, data_id: int = 186):
     """Downloads the data from UCI and saves the csv data in the data folder
 
@@ -48,16 +83,7 @@ def download_data(file_path: str, data_id: int = 186):
         data_id = int(data_id)
     try:
         print("CSV file not found. Fetching dataset...")
-
-        # Fetch the dataset
-        wine_quality = fetch_ucirepo(id=data_id)
-
-        # Features (X) and Targets (y)
-        X = wine_quality.data.features
-        y = wine_quality.data.targets
-
-        # Combine features and targets into a single DataFrame
-        wine_df = pd.concat([X, y], axis=1)
+        wine_df = fetch_data(data_id)
 
         # Save the DataFrame to a CSV file
         wine_df.to_csv(file_path, index=False)
@@ -69,6 +95,47 @@ def download_data(file_path: str, data_id: int = 186):
         raise
 
 
+def download_many(
+    data_ids: list, folder_path: str, max_workers: int = DOWNLOAD_WORKERS
+) -> dict:
+    """Downloads several UCI datasets concurrently, one sub folder per dataset
+
+    Each dataset is written to `<folder_path>/<data_id>/combined.csv`.
+
+    Args:
+        data_ids (list): Data Ids of the datasets to download
+        folder_path (str): Parent directory for the per-dataset folders
+        max_workers (int, optional): Number of download threads. Defaults to
+            DOWNLOAD_WORKERS.
+
+    Raises:
+        RuntimeError: When one or more of the datasets could not be downloaded
+
+    Returns:
+        dict: Mapping of data id to the csv path it was saved to
+    """
+
+    def fetch_one(data_id):
+        csv_path = create_data_folder(
+            os.path.join(folder_path, str(data_id)), BATCH_FILE_NAME
+        )
+        download_data(csv_path, data_id)
+        return csv_path
+
+    paths, failed = {}, {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(data_ids)) or 1) as executor:
+        futures = {data_id: executor.submit(fetch_one, data_id) for data_id in data_ids}
+        for data_id, future in futures.items():
+            try:
+                paths[data_id] = future.result()
+            except Exception as e:
+                failed[data_id] = e
+
+    if failed:
+        raise RuntimeError(f"Failed to download datasets: {failed}")
+    return paths
+
+
 @click.command()
 @click.option(
     "--folder_path",
@@ -76,14 +143,53 @@ def download_data(file_path: str, data_id: int = 186):
     help="Path to directory where raw data will be written to",
 )
 @click.option("--data_id", type=str, help="ID of dataset to be downloaded")
-def main(folder_path: str, data_id: int):
+@click.option(
+    "--data_ids",
+    type=str,
+    default=None,
+    help="Comma separated IDs of datasets to download concurrently",
+)
+@click.option(
+    "--max_workers",
+    type=int,
+    default=DOWNLOAD_WORKERS,
+    help="Download threads in batch mode",
+)
+@click.option(
+    "--store_path",
+    type=str,
+    default=None,
+    help="Raw store folder the new rows of the download are appended to",
+)
+def main(
+    folder_path: str,
+    data_id: int,
+    data_ids: str = None,
+    max_workers: int = DOWNLOAD_WORKERS,
+    store_path: str = None,
+):
     """
     Main function to create a data folder and download the dataset.
 
     Args:
         folder_path (str): Path to the directory for saving raw data.
         data_id (int): ID of the dataset to be downloaded from UCI ML Repository.
+        data_ids (str): Comma separated IDs for batch mode, one folder per dataset.
+        max_workers (int): Number of download threads in batch mode.
+        store_path (str): Raw store folder to append the new rows to instead of
+            writing the csv file.
     """
+    if data_ids:
+        ids = [int(i) for i in data_ids.split(",") if i.strip()]
+        download_many(ids, folder_path, max_workers=max_workers)
+        return
+
+    if store_path:
+        # The store keeps its own partitions, so the full csv is not rewritten
+        result = RawStore(store_path).ingest(fetch_data(data_id))
+        print(f"Appended {result['rows']} new rows to '{store_path}'.")
+        return
+
     # create the analysis folder
     csv_path = create_data_folder(folder_path)
     print("Folder path has been created")
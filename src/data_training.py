@@ -1,18 +1,37 @@
 """This script does the training and saving of our model as a pickle file"""
 
+import os
 import sys
+import time
+import pickle
 import warnings
 
 from sklearn.tree import DecisionTreeClassifier
 import sklearn
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import GridSearchCV
-from sklearn.metrics import classification_report
-from sklearn.metrics import classification_report, accuracy_score
+from sklearn.base import clone
+from sklearn.model_selection import (
+    GridSearchCV,
+    RepeatedStratifiedKFold,
+    StratifiedKFold,
+    cross_val_score,
+)
+from sklearn.metrics import accuracy_score, f1_score
 import joblib
+from joblib import Parallel, delayed, effective_n_jobs
 import click
 
 from data_download import create_data_folder
+from row_validation import RowValidator, read_model_meta, update_model_meta
+from metrics import ConfusionAccumulator
+from resources import stage_resources, RESOURCE_LOG_PATH
+from seeding import (
+    stage_seed,
+    model_fingerprints,
+    reproducibility_meta,
+    compare_fingerprints,
+)
 
 
 warnings.filterwarnings("ignore", category=sklearn.exceptions.UndefinedMetricWarning)
@@ -20,6 +39,9 @@ sys.path.append("src")
 
 FEATS_DATA_PATH = "data/processed/feature_importance.csv"
 REPORT_DATA_PATH = "data/processed/classification_report.csv"
+EVAL_DATA_PATH = "data/processed/evaluation_ci.csv"
+PERM_FEATS_DATA_PATH = "data/processed/permutation_importance.csv"
+PRUNING_DATA_PATH = "data/processed/pruning.csv"
 
 MODEL_PATH = "data/model"
 
@@ -38,15 +60,21 @@ def read_data(data_path: str) -> pd.DataFrame:
     return data
 
 
-def train_model(train_df: pd.DataFrame):
+def fit_model(train_df: pd.DataFrame, random_state: int = 16, n_jobs: int = None):
     """
-    Train a Decision Tree model using GridSearchCV for hyperparameter tuning.
+    Fit a Decision Tree model using GridSearchCV for hyperparameter tuning.
+
+    The folds are not shuffled and every candidate uses the same `random_state`, so the
+    selected tree is the same for any `n_jobs`.
 
     Args:
         train_df (pd.DataFrame): Training DataFrame with features and target.
+        random_state (int, optional): Seed of the tree. Defaults to 16.
+        n_jobs (int, optional): Number of parallel jobs, None for the limit of the
+            active `resources.stage_resources` stage. Defaults to None.
 
     Returns:
-        str: Path to the saved model file.
+        DecisionTreeClassifier: The best tree refit on all training data.
     """
     X_train = train_df.drop(columns="quality")
     y_train = train_df["quality"]
@@ -57,7 +85,7 @@ def train_model(train_df: pd.DataFrame):
         "min_samples_leaf": [1, 2, 5],
         "max_features": [None, "sqrt", "log2"],
     }
-    tree_model = DecisionTreeClassifier(random_state=16)
+    tree_model = DecisionTreeClassifier(random_state=random_state)
 
     # Set up GridSearchCV
     grid_search = GridSearchCV(
@@ -65,13 +93,150 @@ def train_model(train_df: pd.DataFrame):
         param_grid=param_grid,
         cv=5,
         scoring="accuracy",
-        n_jobs=-1,
+        n_jobs=n_jobs,
         verbose=1,
     )
     grid_search.fit(X_train, y_train)
 
     # Get the best model
-    best_tree_model = grid_search.best_estimator_
+    return grid_search.best_estimator_
+
+
+def _predict_latency(model, X: pd.DataFrame, repeats: int = 5) -> float:
+    """Returns the best of `repeats` timings of predicting X, in microseconds per row"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(X)
+        timings.append(time.perf_counter() - start)
+    return min(timings) / len(X) * 1e6
+
+
+def _score_alpha(model, X: pd.DataFrame, y: pd.Series, alpha: float, cv) -> tuple:
+    """Cross-validates and refits the model with one ccp_alpha
+
+    Args:
+        model (DecisionTreeClassifier): Unpruned tree with the selected parameters
+        X (pd.DataFrame): Training features
+        y (pd.Series): Training target
+        alpha (float): Cost-complexity pruning parameter
+        cv (object): Cross-validation splitter
+
+    Returns:
+        tuple: (summary dict, tree refit on all training data)
+    """
+    pruned = clone(model).set_params(ccp_alpha=alpha)
+    scores = cross_val_score(pruned, X, y, cv=cv, scoring="accuracy")
+    pruned.fit(X, y)
+    summary = {
+        "Alpha": alpha,
+        "Accuracy": scores.mean(),
+        "Nodes": pruned.tree_.node_count,
+        "Depth": pruned.get_depth(),
+        "Bytes": len(pickle.dumps(pruned)),
+    }
+    return summary, pruned
+
+
+def prune_model(
+    model, train_df: pd.DataFrame, tolerance: float = 0.005, n_jobs: int = None
+):
+    """
+    Choose the smallest cost-complexity pruned tree within tolerance of the best.
+
+    Every alpha on the pruning path of the model is cross-validated in parallel with
+    the same unshuffled folds as the grid search, so the choice does not depend on
+    `n_jobs`. The smallest tree whose CV accuracy is at most `tolerance` below the best
+    one is kept.
+
+    Args:
+        model (DecisionTreeClassifier): Fitted tree with the selected parameters.
+        train_df (pd.DataFrame): Training DataFrame with features and target.
+        tolerance (float, optional): Accuracy that may be traded for a smaller tree.
+            Defaults to 0.005.
+        n_jobs (int, optional): Number of parallel jobs, None for the limit of the
+            active `resources.stage_resources` stage. Defaults to None.
+
+    Returns:
+        tuple: (chosen tree, DataFrame with the accuracy, node count, depth, pickle
+            size in bytes and predict latency in microseconds per row of every alpha)
+    """
+    X_train = train_df.drop(columns="quality")
+    y_train = train_df["quality"]
+    alphas = np.unique(model.cost_complexity_pruning_path(X_train, y_train).ccp_alphas)
+    # Alphas above the last one prune the tree to its root, which is never useful
+    alphas = alphas[alphas < alphas.max()] if len(alphas) > 1 else alphas
+
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_score_alpha)(model, X_train, y_train, alpha, StratifiedKFold(5))
+        for alpha in alphas
+    )
+    pruning_df = pd.DataFrame([summary for summary, _ in results])
+    pruning_df["Latency"] = [_predict_latency(tree, X_train) for _, tree in results]
+
+    # Fewest nodes among the candidates, and the larger alpha on ties
+    best_accuracy = pruning_df["Accuracy"].max()
+    candidates = pruning_df[pruning_df["Accuracy"] >= best_accuracy - tolerance]
+    chosen = candidates.sort_values(["Nodes", "Alpha"], ascending=[True, False]).index[0]
+    pruning_df["Selected"] = pruning_df.index == chosen
+    return results[chosen][1], pruning_df
+
+
+def build_model(
+    train_df: pd.DataFrame,
+    random_state: int = 16,
+    tolerance: float = 0.005,
+    n_jobs: int = None,
+):
+    """
+    Fit the grid search and prune its best tree, without writing any files.
+
+    Args:
+        train_df (pd.DataFrame): Training DataFrame with features and target.
+        random_state (int, optional): Seed of the tree. Defaults to 16.
+        tolerance (float, optional): Accuracy that may be traded for a smaller tree, None
+            to skip the pruning. Defaults to 0.005.
+        n_jobs (int, optional): Number of parallel jobs, None for the limit of the
+            active `resources.stage_resources` stage. Defaults to None.
+
+    Returns:
+        tuple: (chosen tree, pruning DataFrame or None when pruning is skipped)
+    """
+    model = fit_model(train_df, random_state=random_state, n_jobs=n_jobs)
+    if tolerance is None:
+        return model, None
+    return prune_model(model, train_df, tolerance=tolerance, n_jobs=n_jobs)
+
+
+def train_model(train_df: pd.DataFrame, root_seed: int = None, tolerance: float = 0.005):
+    """
+    Train a Decision Tree model using GridSearchCV for hyperparameter tuning.
+
+    The seeds, the fingerprints of the data, parameters and tree, and the library
+    versions are recorded in model_meta.json so `verify_model` can check a re-run.
+
+    Args:
+        train_df (pd.DataFrame): Training DataFrame with features and target.
+        root_seed (int, optional): Root seed the stage seeds are derived from, None for
+            the default seeds. Defaults to None.
+        tolerance (float, optional): Accuracy that may be traded for a smaller pruned
+            tree, None to keep the unpruned best estimator. Defaults to 0.005.
+
+    Returns:
+        str: Path to the saved model file.
+    """
+    X_train = train_df.drop(columns="quality")
+    best_tree_model, pruning_df = build_model(
+        train_df, random_state=stage_seed("tree", root_seed), tolerance=tolerance
+    )
+    if pruning_df is not None:
+        pruning_df.to_csv(PRUNING_DATA_PATH, index=False)
+        selected = pruning_df[pruning_df["Selected"]].iloc[0]
+        print(
+            f"Pruned tree: {selected['Nodes']} of {pruning_df['Nodes'].max()} nodes, "
+            f"depth {selected['Depth']}, {selected['Bytes']} bytes, "
+            f"{selected['Latency']:.2f} us per row, CV accuracy {selected['Accuracy']:.4f}"
+        )
 
     feature_importances = pd.DataFrame(
         {"Feature": X_train.columns, "Importance": best_tree_model.feature_importances_}
@@ -79,11 +244,66 @@ def train_model(train_df: pd.DataFrame):
 
     feature_importances.to_csv(FEATS_DATA_PATH, index=False)
 
-    joblib.dump(best_tree_model, f"{MODEL_PATH}/model.pkl")
+    # Imported here, validation pulls in deepchecks, which the scoring modules that
+    # import this one for load_model must not pay for at startup
+    from validation import WINE_SCHEMA_SPEC
+
+    # Row level validator for scoring inputs, stored in model_meta.json next to the model
+    # before the model is replaced, so a scoring service never pairs it with an old one
+    RowValidator.from_training(X_train, schema_spec=WINE_SCHEMA_SPEC).save(MODEL_PATH)
+    # Written next to the old model and renamed over it, so a scoring service that
+    # watches model.pkl never reads a partly written file
+    joblib.dump(best_tree_model, f"{MODEL_PATH}/model.pkl.tmp")
+    os.replace(f"{MODEL_PATH}/model.pkl.tmp", f"{MODEL_PATH}/model.pkl")
+    meta = reproducibility_meta(train_df, best_tree_model, root_seed)
+    meta["prune_tolerance"] = tolerance
+    update_model_meta(MODEL_PATH, {"reproducibility": meta})
 
     return f"{MODEL_PATH}/model.pkl"
 
 
+def verify_model(train_df: pd.DataFrame, model_dir: str = MODEL_PATH, n_jobs: int = 1):
+    """
+    Check that the saved model is reproduced by re-running the training.
+
+    The training data must match the recorded fingerprint, the saved model must match
+    the recorded tree, and a refit with the recorded seed must give the same tree.
+    The default `n_jobs=1` also checks that parallel training did not change the result.
+
+    Args:
+        train_df (pd.DataFrame): Training DataFrame with features and target.
+        model_dir (str, optional): Folder holding model.pkl and model_meta.json.
+            Defaults to MODEL_PATH.
+        n_jobs (int, optional): Number of parallel jobs of the re-run. Defaults to 1.
+
+    Raises:
+        ValueError: When model_meta.json has no reproducibility entry
+
+    Returns:
+        list: Descriptions of the mismatches, empty when the model is reproduced
+    """
+    recorded = read_model_meta(model_dir).get("reproducibility")
+    if recorded is None:
+        raise ValueError(f"No reproducibility entry in the metadata of '{model_dir}'")
+    expected = recorded["fingerprints"]
+
+    saved = model_fingerprints(train_df, load_model(f"{model_dir}/model.pkl"))
+    mismatches = [f"saved model {name}" for name in compare_fingerprints(expected, saved)]
+    if saved["data"] != expected["data"]:
+        # A re-run on other data cannot reproduce the model, so stop here
+        return mismatches
+
+    refit, _ = build_model(
+        train_df,
+        random_state=recorded["seeds"]["tree"],
+        tolerance=recorded.get("prune_tolerance"),
+        n_jobs=n_jobs,
+    )
+    rerun = model_fingerprints(train_df, refit)
+    mismatches += [f"re-run {name}" for name in compare_fingerprints(expected, rerun)]
+    return mismatches
+
+
 def load_model(model_path: str):
     """
     Load a saved machine learning model.
@@ -115,19 +335,268 @@ def perform_test(test_df, model):
     # Predictions on the test set
     y_test_pred = model.predict(X_test)
 
-    # Accuracy score
-    test_accuracy = accuracy_score(y_test, y_test_pred)
-    print(f"Test Accuracy: {test_accuracy:.4f}\n")
+    # Accuracy and classification report both come from one confusion matrix
+    confusion = ConfusionAccumulator().update(y_test, y_test_pred)
+    print(f"Test Accuracy: {confusion.accuracy():.4f}\n")
 
     # Classification report
     print("Table 1: Classification report:")
-    report_dict = classification_report(y_test, y_test_pred, output_dict=True)
-
-    report_df = pd.DataFrame(report_dict).transpose()
+    report_df = confusion.report()
     report_df.to_csv(REPORT_DATA_PATH, index=False)
     return report_df
 
 
+def _bootstrap_confusions(y_codes, pred_codes, n_classes, n_boot, seed):
+    """Computes one confusion matrix per bootstrap replicate of the test set
+
+    Args:
+        y_codes (np.ndarray): Integer encoded true labels
+        pred_codes (np.ndarray): Integer encoded predicted labels
+        n_classes (int): Number of distinct labels
+        n_boot (int): Number of bootstrap replicates
+        seed (np.random.SeedSequence): Seed for the resampling
+
+    Returns:
+        np.ndarray: Array of shape (n_boot, n_classes, n_classes) with the counts
+    """
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, len(y_codes), size=(n_boot, len(y_codes)))
+    # Encode (replicate, true, predicted) into one integer so a single bincount does all
+    pairs = y_codes * n_classes + pred_codes
+    offsets = np.arange(n_boot)[:, None] * (n_classes * n_classes)
+    counts = np.bincount(
+        (offsets + pairs[idx]).ravel(), minlength=n_boot * n_classes * n_classes
+    )
+    return counts.reshape(n_boot, n_classes, n_classes)
+
+
+def bootstrap_metrics(
+    y_true, y_pred, n_boot: int = 2000, random_state: int = 123, n_jobs: int = None
+):
+    """Bootstraps accuracy and per-class F1 from a single set of predictions
+
+    The predictions are resampled as index arrays, so the model is never called again.
+    Replicates are split into chunks that run in parallel, and each chunk has its own
+    seed derived from `random_state`, so results do not depend on `n_jobs`.
+
+    Args:
+        y_true (array-like): True labels
+        y_pred (array-like): Predicted labels
+        n_boot (int, optional): Number of bootstrap replicates. Defaults to 2000.
+        random_state (int, optional): Root seed for the resampling. Defaults to 123.
+        n_jobs (int, optional): Number of parallel jobs, None for the limit of the
+            active `resources.stage_resources` stage. Defaults to None.
+
+    Returns:
+        tuple: (labels, accuracy, f1) where accuracy has shape (n_boot,) and f1 has
+            shape (n_boot, n_labels)
+    """
+    labels, codes = np.unique(
+        np.concatenate([np.asarray(y_true), np.asarray(y_pred)]), return_inverse=True
+    )
+    y_codes, pred_codes = codes[: len(y_true)], codes[len(y_true) :]
+    n_classes = len(labels)
+
+    # Keep every chunk at roughly four million sampled indices
+    chunk_size = max(1, min(n_boot, 2**22 // max(len(y_codes), 1)))
+    sizes = [min(chunk_size, n_boot - start) for start in range(0, n_boot, chunk_size)]
+    seeds = np.random.SeedSequence(random_state).spawn(len(sizes))
+    confusions = np.concatenate(
+        Parallel(n_jobs=n_jobs)(
+            delayed(_bootstrap_confusions)(y_codes, pred_codes, n_classes, size, seed)
+            for size, seed in zip(sizes, seeds)
+        )
+    )
+
+    tp = np.diagonal(confusions, axis1=1, axis2=2)
+    accuracy = tp.sum(axis=1) / len(y_codes)
+    denom = confusions.sum(axis=2) + confusions.sum(axis=1)
+    f1 = np.divide(2 * tp, denom, out=np.zeros(tp.shape), where=denom > 0)
+    return labels, accuracy, f1
+
+
+def evaluate_with_ci(
+    test_df: pd.DataFrame,
+    model,
+    train_df: pd.DataFrame = None,
+    n_boot: int = 2000,
+    n_splits: int = 5,
+    n_repeats: int = 3,
+    confidence: float = 0.95,
+    random_state: int = 123,
+    n_jobs: int = None,
+) -> pd.DataFrame:
+    """
+    Estimate confidence intervals for accuracy and per-class F1.
+
+    The test predictions are bootstrapped, and when training data is given the model
+    is also refit with repeated stratified k-fold to get a cross-validated accuracy.
+    Its interval comes from bootstrapping the mean of the fold scores, so it bounds the
+    mean accuracy and not the spread of single folds.
+
+    Args:
+        test_df (pd.DataFrame): Test DataFrame with features and target.
+        model (object): Trained machine learning model.
+        train_df (pd.DataFrame, optional): Training DataFrame for the k-fold
+            evaluation. Defaults to None.
+        n_boot (int, optional): Number of bootstrap replicates. Defaults to 2000.
+        n_splits (int, optional): Number of folds. Defaults to 5.
+        n_repeats (int, optional): Number of k-fold repetitions. Defaults to 3.
+        confidence (float, optional): Confidence level of the intervals. Defaults to 0.95.
+        random_state (int, optional): Seed for resampling and splitting. Defaults to 123.
+        n_jobs (int, optional): Number of parallel jobs, None for the limit of the
+            active `resources.stage_resources` stage. Defaults to None.
+
+    Returns:
+        pd.DataFrame: One row per metric with the estimate and interval bounds.
+    """
+    X_test = test_df.drop(columns="quality")
+    y_test = test_df["quality"].to_numpy()
+    y_test_pred = model.predict(X_test)
+
+    labels, accuracy, f1 = bootstrap_metrics(
+        y_test, y_test_pred, n_boot=n_boot, random_state=random_state, n_jobs=n_jobs
+    )
+    point_f1 = f1_score(
+        y_test, y_test_pred, labels=labels, average=None, zero_division=0
+    )
+    rows = [("accuracy", accuracy_score(y_test, y_test_pred), accuracy)]
+    rows += [(f"f1_{label}", point_f1[i], f1[:, i]) for i, label in enumerate(labels)]
+    if train_df is not None:
+        cv = RepeatedStratifiedKFold(
+            n_splits=n_splits, n_repeats=n_repeats, random_state=random_state
+        )
+        cv_scores = cross_val_score(
+            clone(model),
+            train_df.drop(columns="quality"),
+            train_df["quality"],
+            cv=cv,
+            scoring="accuracy",
+            n_jobs=n_jobs,
+        )
+        rng = np.random.default_rng(random_state)
+        resampled = rng.integers(0, len(cv_scores), size=(n_boot, len(cv_scores)))
+        rows.append(("cv_accuracy", cv_scores.mean(), cv_scores[resampled].mean(axis=1)))
+
+    alpha = (1 - confidence) / 2
+    ci_df = pd.DataFrame(
+        [
+            {
+                "Metric": name,
+                "Estimate": estimate,
+                "Lower": np.quantile(samples, alpha),
+                "Upper": np.quantile(samples, 1 - alpha),
+            }
+            for name, estimate, samples in rows
+        ]
+    )
+    ci_df.to_csv(EVAL_DATA_PATH, index=False)
+    return ci_df
+
+
+def _permuted_scores(model, X, y, features, n_repeats, random_state, round_idx):
+    """Scores the model with each of the given features permuted n_repeats times
+
+    The worker makes a single private copy of the matrix and permutes one column
+    in place at a time, restoring it afterwards.
+
+    Args:
+        model (object): Trained machine learning model.
+        X (np.ndarray): float32 feature matrix, shared between workers
+        y (np.ndarray): True labels
+        features (list): Column indices handled by this worker
+        n_repeats (int): Number of permutations per feature
+        random_state (int): Root seed
+        round_idx (int): Index of the current round, used to derive the seeds
+
+    Returns:
+        np.ndarray: Accuracy scores of shape (len(features), n_repeats)
+    """
+    X = np.array(X, copy=True)
+    scores = np.empty((len(features), n_repeats))
+    with warnings.catch_warnings():
+        # The model was fit on a DataFrame, the raw matrix has no feature names
+        warnings.simplefilter("ignore", UserWarning)
+        for i, j in enumerate(features):
+            rng = np.random.default_rng([random_state, round_idx, j])
+            original = X[:, j].copy()
+            for r in range(n_repeats):
+                X[:, j] = original[rng.permutation(len(original))]
+                scores[i, r] = np.mean(model.predict(X) == y)
+            X[:, j] = original
+    return scores
+
+
+def compute_permutation_importance(
+    test_df: pd.DataFrame,
+    model,
+    repeats_per_round: int = 5,
+    max_repeats: int = 50,
+    patience: int = 2,
+    random_state: int = 123,
+    n_jobs: int = None,
+) -> pd.DataFrame:
+    """
+    Compute permutation feature importance on the test set.
+
+    Features are split into one batch per worker and scored in a process pool. Work
+    runs in rounds of `repeats_per_round` permutations per feature, and stops early once
+    the importance ranking has not changed for `patience` rounds.
+
+    Args:
+        test_df (pd.DataFrame): Test DataFrame with features and target.
+        model (object): Trained machine learning model.
+        repeats_per_round (int, optional): Permutations per feature and round. Defaults to 5.
+        max_repeats (int, optional): Maximum permutations per feature. Defaults to 50.
+        patience (int, optional): Stable rounds needed to stop early. Defaults to 2.
+        random_state (int, optional): Seed for the permutations. Defaults to 123.
+        n_jobs (int, optional): Number of worker processes, None for the limit of the
+            active `resources.stage_resources` stage. Defaults to None.
+
+    Returns:
+        pd.DataFrame: Mean drop in accuracy per feature with its standard deviation.
+    """
+    X_test = test_df.drop(columns="quality")
+    X = np.ascontiguousarray(X_test.to_numpy(dtype=np.float32))
+    y = test_df["quality"].to_numpy()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        baseline = np.mean(model.predict(X) == y)
+
+    n_batches = min(effective_n_jobs(n_jobs), X.shape[1])
+    batches = [list(b) for b in np.array_split(np.arange(X.shape[1]), n_batches)]
+
+    drops = np.empty((X.shape[1], 0))
+    ranking, stable_rounds = None, 0
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for round_idx in range(max(max_repeats // repeats_per_round, 1)):
+            scores = parallel(
+                delayed(_permuted_scores)(
+                    model, X, y, batch, repeats_per_round, random_state, round_idx
+                )
+                for batch in batches
+            )
+            drops = np.hstack([drops, baseline - np.vstack(scores)])
+
+            new_ranking = np.argsort(-drops.mean(axis=1), kind="stable")
+            stable_rounds = stable_rounds + 1 if np.array_equal(new_ranking, ranking) else 0
+            ranking = new_ranking
+            if stable_rounds >= patience:
+                break
+
+    perm_importances = pd.DataFrame(
+        {
+            "Feature": X_test.columns,
+            "Importance": drops.mean(axis=1),
+            "Std": drops.std(axis=1),
+            "Repeats": drops.shape[1],
+        }
+    ).sort_values(by="Importance", ascending=False)
+
+    perm_importances.to_csv(PERM_FEATS_DATA_PATH, index=False)
+    return perm_importances
+
+
 @click.command()
 @click.option(
     "--model_path",
@@ -144,7 +613,38 @@ def perform_test(test_df, model):
     type=str,
     help="training data path",
 )
-def main(model_path, train_data, test_data):
+@click.option(
+    "--n_boot",
+    type=int,
+    default=2000,
+    help="Bootstrap replicates for the confidence intervals, 0 to skip",
+)
+@click.option(
+    "--seed",
+    type=int,
+    default=None,
+    help="Root seed for all stages, the default keeps the historical seeds",
+)
+@click.option(
+    "--prune_tolerance",
+    type=float,
+    default=0.005,
+    help="CV accuracy that may be traded for a smaller pruned tree, negative to skip",
+)
+@click.option(
+    "--verify",
+    is_flag=True,
+    help="Re-run the training and check it reproduces the saved model",
+)
+def main(
+    model_path,
+    train_data,
+    test_data,
+    n_boot=2000,
+    seed=None,
+    prune_tolerance=0.005,
+    verify=False,
+):
     """
     Main function to orchestrate model training and evaluation.
 
@@ -152,16 +652,50 @@ def main(model_path, train_data, test_data):
         model_path (str): Path to save the model.
         train_data (str): Path to training data.
         test_data (str): Path to test data.
+        n_boot (int): Bootstrap replicates for the confidence intervals, 0 to skip.
+        seed (int): Root seed for all stages, None for the historical seeds.
+        prune_tolerance (float): CV accuracy traded for a smaller tree, negative to skip.
+        verify (bool): Only check that a re-run reproduces the saved model.
     """
+    if verify:
+        with stage_resources("training"):
+            mismatches = verify_model(read_data(train_data), model_dir=model_path)
+        if mismatches:
+            print(f"Model is not reproduced, mismatching fingerprints: {mismatches}")
+            sys.exit(1)
+        print("Model is reproduced bit for bit.")
+        return
+
     model_path = create_data_folder(model_path)
     train_data = read_data(train_data)
     test_data = read_data(test_data)
 
-    model_path = train_model(train_data)
+    with stage_resources("training", log_path=RESOURCE_LOG_PATH):
+        model_path = train_model(
+            train_data,
+            root_seed=seed,
+            tolerance=prune_tolerance if prune_tolerance >= 0 else None,
+        )
 
     model = load_model(model_path)
 
     perform_test(test_data, model)
+    with stage_resources("evaluation", log_path=RESOURCE_LOG_PATH):
+        compute_permutation_importance(
+            test_data, model, random_state=stage_seed("permutation", seed)
+        )
+
+        if n_boot > 0:
+            print("Table 2: Confidence intervals:")
+            print(
+                evaluate_with_ci(
+                    test_data,
+                    model,
+                    train_df=train_data,
+                    n_boot=n_boot,
+                    random_state=stage_seed("bootstrap", seed),
+                )
+            )
 
 
 if __name__ == "__main__":
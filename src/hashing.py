@@ -0,0 +1,112 @@
+"""This module contains vectorized row hashing helpers used to detect duplicate rows
+without hashing every row as a Python object"""
+
+import numpy as np
+import pandas as pd
+
+_SEED = np.uint64(0x9E3779B97F4A7C15)
+_MUL1 = np.uint64(0xBF58476D1CE4E5B9)
+_MUL2 = np.uint64(0x94D049BB133111EB)
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """Applies the splitmix64 finalizer to an array of unsigned 64 bit integers
+
+    Args:
+        values (np.ndarray): uint64 array to scramble
+
+    Returns:
+        np.ndarray: Scrambled uint64 array of the same shape
+    """
+    with np.errstate(over="ignore"):
+        values = (values ^ (values >> np.uint64(30))) * _MUL1
+        values = (values ^ (values >> np.uint64(27))) * _MUL2
+        return values ^ (values >> np.uint64(31))
+
+
+def row_bits(data) -> np.ndarray:
+    """Returns the canonical 64 bit representation of a numeric table
+
+    Negative zero is folded into zero and every NaN is mapped onto the same bit
+    pattern so that rows which compare equal in pandas also have equal bits.
+
+    Args:
+        data (pd.DataFrame | np.ndarray): Numeric table to convert
+
+    Returns:
+        np.ndarray: 2D uint64 view over a float64 copy of the data
+    """
+    if isinstance(data, pd.DataFrame):
+        data = data.to_numpy(dtype=np.float64)
+    values = np.asarray(data, dtype=np.float64).reshape(len(data), -1) + 0.0
+    values[np.isnan(values)] = np.nan
+    return values.view(np.uint64)
+
+
+def hash_rows(data) -> np.ndarray:
+    """Computes a 64 bit hash for every row of a numeric table
+
+    Args:
+        data (pd.DataFrame | np.ndarray): Numeric table to hash
+
+    Returns:
+        np.ndarray: uint64 array with one hash per row
+    """
+    bits = row_bits(data)
+    hashes = np.full(bits.shape[0], _SEED, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for j in range(bits.shape[1]):
+            hashes = _mix(hashes ^ _mix(bits[:, j] + _SEED * np.uint64(j + 1)))
+    return hashes
+
+
+def find_duplicate_rows(data) -> np.ndarray:
+    """Flags duplicated rows the same way as `DataFrame.duplicated(keep="first")`
+
+    Rows are first grouped by their 64 bit hash. Only rows that share a hash with
+    another row are compared exactly, so hash collisions never produce false positives.
+
+    Args:
+        data (pd.DataFrame | np.ndarray): Numeric table to check
+
+    Returns:
+        np.ndarray: Boolean mask, True for every repeated occurrence of a row
+    """
+    bits = row_bits(data)
+    hashes = hash_rows(bits.view(np.float64))
+    duplicated = np.zeros(bits.shape[0], dtype=bool)
+
+    order = np.argsort(hashes, kind="stable")
+    sorted_hashes = hashes[order]
+    same = sorted_hashes[1:] == sorted_hashes[:-1]
+    if not same.any():
+        return duplicated
+
+    # Exact confirmation on the (usually tiny) set of rows that share a hash
+    candidates = np.zeros(bits.shape[0], dtype=bool)
+    candidates[order[1:][same]] = True
+    candidates[order[:-1][same]] = True
+    candidate_idx = np.flatnonzero(candidates)
+    confirmed = pd.DataFrame(bits[candidate_idx]).duplicated(keep="first").to_numpy()
+    duplicated[candidate_idx[confirmed]] = True
+    return duplicated
+
+
+def hash_split(data, test_share: float = 0.2, seed: int = 123) -> np.ndarray:
+    """Assigns every row to the test set or not by a seeded hash of its values
+
+    A row keeps its assignment however much data is added later, so a growing dataset
+    can be split incrementally without moving rows between train and test.
+
+    Args:
+        data (pd.DataFrame | np.ndarray): Numeric table to split
+        test_share (float, optional): Expected share of test rows. Defaults to 0.2.
+        seed (int, optional): Seed mixed into the row hashes. Defaults to 123.
+
+    Returns:
+        np.ndarray: Boolean mask, True for the test rows
+    """
+    with np.errstate(over="ignore"):
+        hashes = _mix(hash_rows(data) ^ _mix(np.uint64(seed) + _SEED))
+    # The top 53 bits give a uniform float in [0, 1)
+    return (hashes >> np.uint64(11)).astype(np.float64) / 2.0**53 < test_share
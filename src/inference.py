@@ -0,0 +1,404 @@
+"""This module contains the helpers used to score new wine measurements with the saved model"""
+
+import os
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from data_training import load_model
+from row_validation import RowValidator, fill_rejected, predict_valid
+
+sys.path.append("src")
+
+MODEL_PATH = "data/model/model.pkl"
+TEST_DATA_PATH = "data/processed/wine_test.csv"
+
+
+def _file_version(path: str) -> tuple:
+    """Identifies the current contents of a file by inode, mtime and size"""
+    stat = os.stat(path)
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class PredictionCache:
+    """LRU/TTL cache in front of `load_model(model_path).predict`
+
+    Rows are keyed by their feature values rounded to a per-column number of decimals,
+    so repeated or near-identical measurements are only scored once. The cache is
+    cleared and the model reloaded whenever the model file changes on disk. Rows are
+    checked by the model's `RowValidator` first, and rejected rows are never scored.
+
+    Args:
+        model_path (str, optional): Path to the saved model file. Defaults to MODEL_PATH.
+        precision (int | dict, optional): Decimals kept per column, either one value for
+            all columns or a mapping of column name to decimals. Defaults to 4.
+        maxsize (int, optional): Maximum number of cached rows. Defaults to 100_000.
+        ttl (float, optional): Seconds before an entry expires, None to never expire.
+            Defaults to None.
+        default_precision (int, optional): Decimals for columns missing from a precision
+            mapping. Defaults to 4.
+    """
+
+    def __init__(
+        self,
+        model_path: str = MODEL_PATH,
+        precision=4,
+        maxsize: int = 100_000,
+        ttl: float = None,
+        default_precision: int = 4,
+    ):
+        self.model_path = model_path
+        self.precision = precision
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.default_precision = default_precision
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.rejected_rows = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._model = None
+        self._validator = None
+        self._version = None
+
+    def _current_model(self):
+        """Returns the model, its validator and its version, reloading them and clearing
+        the cache if the file changed"""
+        version = _file_version(self.model_path)
+        with self._lock:
+            if version != self._version:
+                if self._version is not None:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._model = load_model(self.model_path)
+                self._validator = RowValidator.load(self.model_path, self._model)
+                self._version = version
+            return self._model, self._validator, self._version
+
+    def _keys(self, X: pd.DataFrame) -> list:
+        """Builds one cache key per row from the quantized feature values"""
+        if isinstance(self.precision, dict):
+            decimals = [self.precision.get(c, self.default_precision) for c in X.columns]
+        else:
+            decimals = [self.precision] * X.shape[1]
+        scale = 10.0 ** np.asarray(decimals, dtype=np.float64)
+        quantized = np.rint(X.to_numpy(dtype=np.float64) * scale).astype(np.int64)
+        return [row.tobytes() for row in quantized]
+
+    def predict(self, X: pd.DataFrame, return_rejected: bool = False):
+        """Predicts a batch of rows, only scoring the rows that are not cached
+
+        Args:
+            X (pd.DataFrame): Feature rows to score
+            return_rejected (bool, optional): Also return the rows the validator
+                rejected. Defaults to False.
+
+        Returns:
+            np.ndarray: Predicted labels, one per row and `row_validation.REJECTED_LABEL`
+                for rejected rows, followed by the rejected rows with a `reason` column
+                when `return_rejected` is set
+        """
+        model, validator, version = self._current_model()
+        X, rejected, rejected_mask = validator.split(X, return_mask=True)
+        if len(rejected):
+            with self._lock:
+                self.rejected_rows += len(rejected)
+        keys = self._keys(X)
+        results = [None] * len(keys)
+        missing = {}
+        now = time.monotonic()
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and (entry[1] is None or entry[1] > now):
+                    self._entries.move_to_end(key)
+                    results[i] = entry[0]
+                    self.hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+                    self.misses += 1
+
+        if missing:
+            # Score each distinct missing key once, using its first row
+            first_rows = [positions[0] for positions in missing.values()]
+            predictions = model.predict(X.iloc[first_rows])
+            expires = now + self.ttl if self.ttl is not None else None
+            with self._lock:
+                for (key, positions), prediction in zip(missing.items(), predictions):
+                    for i in positions:
+                        results[i] = prediction
+                    # Entries are scoped to the model version they were computed with
+                    if self._version == version:
+                        self._entries[key] = (prediction, expires)
+                        self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+
+        predictions = fill_rejected(np.asarray(results), rejected_mask)
+        return (predictions, rejected) if return_rejected else predictions
+
+    def predict_one(self, row):
+        """Predicts a single row
+
+        Args:
+            row (pd.Series | dict): Feature values of one measurement
+
+        Returns:
+            object: The predicted label
+        """
+        return self.predict(pd.DataFrame([dict(row)]))[0]
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of rows served from the cache since it was created"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        """Returns the cache counters
+
+        Returns:
+            dict: Hits, misses, hit rate, evictions, invalidations, rejected rows and
+                current size
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "rejected_rows": self.rejected_rows,
+            "size": len(self._entries),
+        }
+
+
+class ModelHolder:
+    """Serves predictions from the saved model and swaps in new versions without downtime
+
+    A background thread watches the model file. When it changes, the new model is
+    loaded, warmed up and checked on a canary batch from the test data while the old
+    model keeps serving. Only a model that passes replaces the current one. The swap is
+    a single reference assignment, so calls that already started finish on the model
+    they started with and no call ever waits for a load. Every model is served with the
+    `RowValidator` stored next to it, and rows it rejects are never scored.
+
+    Args:
+        model_path (str, optional): Path to the saved model file. Defaults to MODEL_PATH.
+        canary_path (str, optional): Csv file with labelled canary rows.
+            Defaults to TEST_DATA_PATH.
+        canary_rows (int, optional): Number of canary rows used. Defaults to 200.
+        max_accuracy_drop (float, optional): Largest drop in canary accuracy against the
+            current model that a new model may have. Defaults to 0.1.
+        poll_interval (float, optional): Seconds between checks of the model file.
+            Defaults to 1.0.
+        on_event (callable, optional): Called with every swap or rejection event dict.
+            Defaults to print.
+    """
+
+    def __init__(
+        self,
+        model_path: str = MODEL_PATH,
+        canary_path: str = TEST_DATA_PATH,
+        canary_rows: int = 200,
+        max_accuracy_drop: float = 0.1,
+        poll_interval: float = 1.0,
+        on_event=print,
+    ):
+        self.model_path = model_path
+        self.max_accuracy_drop = max_accuracy_drop
+        self.poll_interval = poll_interval
+        self.on_event = on_event
+        canary = pd.read_csv(canary_path, nrows=canary_rows)
+        self._canary_X = canary.drop(columns="quality")
+        self._canary_y = canary["quality"].to_numpy()
+        self.events = []
+        self.swaps = 0
+        self.rejections = 0
+        self.predictions = 0
+        self.rejected_rows = 0
+        self.watch_errors = 0
+        self._rejected_version = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        version, candidate = self._load(self.model_path, current=None)
+        if candidate["error"] is not None:
+            raise ValueError(f"Model '{model_path}' failed to load: {candidate['error']}")
+        self._current = candidate
+        self._record("load", version, candidate)
+
+    def _load(self, path: str, current: dict) -> tuple:
+        """Loads, warms up and canary checks a model file
+
+        Args:
+            path (str): Path to the model file
+            current (dict): Candidate dict of the serving model, None for the first load
+
+        Returns:
+            tuple: (version of the file when loading started, None if it could not be
+                read, and candidate dict with the model, its timings, canary accuracy
+                and an error message or None)
+        """
+        version = None
+        candidate = {"model": None, "version": version, "error": None}
+        try:
+            version = candidate["version"] = _file_version(path)
+            start = time.perf_counter()
+            model = load_model(path)
+            validator = RowValidator.load(path, model)
+            candidate["load_seconds"] = time.perf_counter() - start
+
+            # The first call pays for lazy allocations, so it is kept off the serving path
+            start = time.perf_counter()
+            predictions, _ = predict_valid(model, validator, self._canary_X)
+            candidate["warmup_seconds"] = time.perf_counter() - start
+            candidate["canary_accuracy"] = float(np.mean(predictions == self._canary_y))
+            candidate["model"] = model
+            candidate["validator"] = validator
+        except Exception as e:
+            candidate["error"] = f"{type(e).__name__}: {e}"
+            return version, candidate
+
+        if current is not None:
+            allowed = current["canary_accuracy"] - self.max_accuracy_drop
+            if candidate["canary_accuracy"] < allowed:
+                accuracy = candidate["canary_accuracy"]
+                candidate["error"] = f"canary accuracy {accuracy:.4f} is below {allowed:.4f}"
+        return version, candidate
+
+    def _record(self, event: str, version: tuple, candidate: dict):
+        """Stores an event and hands it to the callback"""
+        record = {"event": event, "version": None if version is None else list(version)}
+        record.update(
+            (key, candidate[key])
+            for key in ("load_seconds", "warmup_seconds", "canary_accuracy", "error")
+            if candidate.get(key) is not None
+        )
+        with self._lock:
+            self.events.append(record)
+        if self.on_event is not None:
+            self.on_event(record)
+
+    def check(self) -> bool:
+        """Loads the model file if it changed and swaps it in if it passes
+
+        Returns:
+            bool: True if a new model was swapped in
+        """
+        try:
+            version = _file_version(self.model_path)
+        except FileNotFoundError:
+            # The file is being replaced, the next check sees the new one
+            return False
+        if version in (self._current["version"], self._rejected_version):
+            return False
+
+        version, candidate = self._load(self.model_path, current=self._current)
+        if candidate["error"] is not None:
+            try:
+                unchanged = version is not None and _file_version(self.model_path) == version
+            except FileNotFoundError:
+                unchanged = False
+            if unchanged:
+                # Only a file that did not change while loading is skipped until it
+                # changes again, a partly written one is retried on the next check
+                self._rejected_version = version
+                self.rejections += 1
+                self._record("rejected", version, candidate)
+            return False
+
+        with self._lock:
+            self._current = candidate
+            self.swaps += 1
+        self._record("swap", version, candidate)
+        return True
+
+    def _watch(self):
+        """Body of the watcher thread
+
+        An error in one check is recorded as an `error` event and polling goes on, so
+        a model file that is briefly missing or unreadable never stops hot reloading.
+        """
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check()
+            except Exception as e:
+                with self._lock:
+                    self.watch_errors += 1
+                self._record("error", None, {"error": f"{type(e).__name__}: {e}"})
+
+    def start(self):
+        """Starts watching the model file in a background thread
+
+        Returns:
+            ModelHolder: self, so it can be used as `holder = ModelHolder().start()`
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the watcher thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def model(self):
+        """The model currently serving predictions"""
+        return self._current["model"]
+
+    def predict(self, X: pd.DataFrame, return_rejected: bool = False):
+        """Predicts a batch with the current model
+
+        The model is read once at the start, so a swap during the call does not
+        affect it.
+
+        Args:
+            X (pd.DataFrame): Feature rows to score
+            return_rejected (bool, optional): Also return the rows the validator
+                rejected. Defaults to False.
+
+        Returns:
+            np.ndarray: Predicted labels, one per row and `row_validation.REJECTED_LABEL`
+                for rejected rows, followed by the rejected rows with a `reason` column
+                when `return_rejected` is set
+        """
+        current = self._current
+        predictions, rejected = predict_valid(current["model"], current["validator"], X)
+        with self._lock:
+            self.predictions += len(predictions) - len(rejected)
+            self.rejected_rows += len(rejected)
+        return (predictions, rejected) if return_rejected else predictions
+
+    def metrics(self) -> dict:
+        """Returns the serving metrics
+
+        Returns:
+            dict: Current version, counters, and the load time, warm-up latency and
+                canary accuracy of the serving model
+        """
+        current = self._current
+        return {
+            "version": list(current["version"]),
+            "swaps": self.swaps,
+            "rejections": self.rejections,
+            "predictions": self.predictions,
+            "rejected_rows": self.rejected_rows,
+            "watch_errors": self.watch_errors,
+            "load_seconds": current["load_seconds"],
+            "warmup_seconds": current["warmup_seconds"],
+            "canary_accuracy": current["canary_accuracy"],
+        }
@@ -0,0 +1,486 @@
+"""This script load tests the inference path. It replays feature rows against direct
+model calls, the batch scoring CLI and a local HTTP stand-in, reports throughput,
+latency percentiles, CPU and memory per run, and profiles the hottest run"""
+
+import os
+import sys
+import json
+import time
+import cProfile
+import pstats
+import resource
+import tempfile
+import threading
+import subprocess
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import click
+
+from data_training import load_model
+from row_validation import RowValidator, predict_valid
+from inference import ModelHolder, MODEL_PATH, TEST_DATA_PATH
+
+sys.path.append("src")
+
+OUTPUT_PATH = "data/load_test"
+BATCH_CLI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "batch_inference.py")
+
+
+def sample_rows(
+    n_rows: int,
+    source: str = TEST_DATA_PATH,
+    synthetic: bool = False,
+    random_state: int = 123,
+) -> pd.DataFrame:
+    """Samples feature rows to replay, with replacement so any number can be drawn
+
+    Args:
+        n_rows (int): Number of rows
+        source (str, optional): Csv file with the features. Defaults to TEST_DATA_PATH.
+        synthetic (bool, optional): Draw new rows from a normal distribution with the
+            mean and standard deviation of every source column, clipped to its range,
+            instead of reusing source rows. Defaults to False.
+        random_state (int, optional): Seed of the sampler. Defaults to 123.
+
+    Returns:
+        pd.DataFrame: The rows, with the source columns except quality
+    """
+    features = pd.read_csv(source).drop(columns="quality", errors="ignore")
+    rng = np.random.default_rng(random_state)
+    if not synthetic:
+        return features.iloc[rng.integers(0, len(features), n_rows)].reset_index(drop=True)
+    values = rng.normal(
+        features.mean().to_numpy(), features.std().to_numpy(), size=(n_rows, features.shape[1])
+    )
+    values = np.clip(values, features.min().to_numpy(), features.max().to_numpy())
+    return pd.DataFrame(values, columns=features.columns)
+
+
+def _handle_predict(holder: ModelHolder, body: bytes) -> bytes:
+    """Scores one json request of the HTTP stand-in
+
+    Args:
+        holder (ModelHolder): Holder of the serving model
+        body (bytes): `{"columns": [...], "rows": [[...], ...]}`
+
+    Returns:
+        bytes: `{"predictions": [...], "rejected": [{"row": ..., "reason": ...}, ...]}`
+            with `row_validation.REJECTED_LABEL` as prediction of rejected rows
+    """
+    request = json.loads(body)
+    X = pd.DataFrame(request["rows"], columns=request["columns"])
+    predictions, rejected = holder.predict(X, return_rejected=True)
+    rejected = [
+        {"row": int(row), "reason": reason} for row, reason in rejected["reason"].items()
+    ]
+    return json.dumps({"predictions": predictions.tolist(), "rejected": rejected}).encode()
+
+
+def make_server(holder: ModelHolder, port: int = 0) -> ThreadingHTTPServer:
+    """Builds a local HTTP stand-in for the scoring service
+
+    Every POST request is handled on its own thread by `_handle_predict`.
+
+    Args:
+        holder (ModelHolder): Holder of the serving model
+        port (int, optional): Port to listen on, 0 for a free one. Defaults to 0.
+
+    Returns:
+        ThreadingHTTPServer: The server, not yet serving
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            response = _handle_predict(holder, body)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer(("127.0.0.1", port), Handler)
+
+
+class DirectTarget:
+    """Scores requests with the row validator and `model.predict` in the load test process"""
+
+    name = "direct"
+
+    def __init__(self, model_path: str, data_path: str):
+        self.model = load_model(model_path)
+        self.validator = RowValidator.load(model_path, self.model)
+
+    def send(self, batch: pd.DataFrame):
+        return predict_valid(self.model, self.validator, batch)[0]
+
+    def local(self, batch: pd.DataFrame):
+        """The in-process work of one request, used for profiling"""
+        return self.send(batch)
+
+    def close(self):
+        pass
+
+
+class HttpTarget:
+    """Scores requests through the local HTTP stand-in, one connection per request"""
+
+    name = "http"
+
+    def __init__(self, model_path: str, data_path: str):
+        self.holder = ModelHolder(model_path, canary_path=data_path, on_event=None)
+        self.server = make_server(self.holder)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def send(self, batch: pd.DataFrame):
+        body = json.dumps({"columns": list(batch.columns), "rows": batch.values.tolist()})
+        connection = HTTPConnection(*self.server.server_address)
+        try:
+            connection.request("POST", "/predict", body, {"Content-Type": "application/json"})
+            response = connection.getresponse()
+            return json.loads(response.read())["predictions"]
+        finally:
+            connection.close()
+
+    def local(self, batch: pd.DataFrame):
+        body = json.dumps({"columns": list(batch.columns), "rows": batch.values.tolist()})
+        return _handle_predict(self.holder, body.encode())
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class BatchCliTarget:
+    """Scores every request with a run of the batch scoring CLI on a csv file"""
+
+    name = "batch"
+
+    def __init__(self, model_path: str, data_path: str):
+        self.model_path = model_path
+        self.model = load_model(model_path)
+        self.validator = RowValidator.load(model_path, self.model)
+        self.folder = tempfile.TemporaryDirectory()
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _write(self, batch: pd.DataFrame) -> str:
+        with self._lock:
+            self._count += 1
+            path = os.path.join(self.folder.name, f"request_{self._count}.csv")
+        batch.to_csv(path, index=False)
+        return path
+
+    def send(self, batch: pd.DataFrame):
+        path = self._write(batch)
+        subprocess.run(
+            [
+                sys.executable,
+                BATCH_CLI_PATH,
+                path,
+                f"--model_path={self.model_path}",
+                f"--output_dir={self.folder.name}",
+                "--n_workers=1",
+            ],
+            check=True,
+            capture_output=True,
+        )
+
+    def local(self, batch: pd.DataFrame):
+        # The per-file work of a CLI worker (read, validate, predict, write) done in this
+        # process, since cProfile cannot follow the CLI and its worker processes
+        path = self._write(batch)
+        predictions, _ = predict_valid(self.model, self.validator, pd.read_csv(path))
+        pd.DataFrame({"prediction": predictions}).to_csv(f"{path}.pred", index=False)
+
+    def close(self):
+        self.folder.cleanup()
+
+
+TARGETS = {target.name: target for target in (DirectTarget, HttpTarget, BatchCliTarget)}
+
+
+def _cpu_times() -> tuple:
+    """Returns the CPU seconds used by this process and by its finished children"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime, children.ru_utime + children.ru_stime
+
+
+def _rss_mb() -> float:
+    """Returns the current resident memory of this process in MB, nan if unknown"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return float("nan")
+
+
+def _children_peak_rss_mb() -> float:
+    """Returns the largest resident memory of any finished child process in MB
+
+    This is the high-water mark kept by getrusage, so it never decreases during the
+    lifetime of this process and does not see children that are still running.
+    """
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def run_load(target, batches: list, concurrency: int = 1, rate: float = None) -> dict:
+    """Replays request batches against a target and measures the run
+
+    Without a rate, `concurrency` threads send requests back to back (closed loop).
+    With a rate, request i is due at `i / rate` seconds and its latency is counted
+    from that time, so a target that falls behind shows the queueing delay instead
+    of hiding it (open loop).
+
+    Args:
+        target (object): One of the TARGETS, already set up
+        batches (list): Request batches, one DataFrame per request
+        concurrency (int, optional): Number of client threads. Defaults to 1.
+        rate (float, optional): Requests per second, None for a closed loop.
+            Defaults to None.
+
+    Returns:
+        dict: Throughput, latency percentiles in ms, CPU seconds of this process and of
+            child processes, CPU utilization, the resident memory of this process in MB
+            at the end and at its peak during the run (sampled every 5 ms), and the
+            largest resident memory of a finished child process in MB (0 when the run
+            started no children)
+    """
+    latencies = np.zeros(len(batches))
+    errors = []
+    next_request = iter(range(len(batches)))
+    lock = threading.Lock()
+
+    def client():
+        while True:
+            with lock:
+                i = next(next_request, None)
+            if i is None:
+                return
+            due = start + i / rate if rate else time.perf_counter()
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                target.send(batches[i])
+            except Exception as e:
+                errors.append(e)
+            latencies[i] = time.perf_counter() - due
+
+    peak_rss = [_rss_mb()]
+    done = threading.Event()
+
+    def sample_rss():
+        while not done.wait(0.005):
+            peak_rss[0] = max(peak_rss[0], _rss_mb())
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    (start_own, start_children), start = _cpu_times(), time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    own, children = _cpu_times()
+    own, children = own - start_own, children - start_children
+    done.set()
+    sampler.join()
+    cpu = own + children
+
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+    return {
+        "mode": target.name,
+        "requests": len(batches),
+        "errors": len(errors),
+        "concurrency": concurrency,
+        "rate": rate,
+        "throughput": len(batches) / wall,
+        "rows_per_second": sum(len(b) for b in batches) / wall,
+        "p50_ms": p50,
+        "p90_ms": p90,
+        "p99_ms": p99,
+        "max_ms": latencies.max() * 1000,
+        "cpu_seconds": cpu,
+        "child_cpu_seconds": children,
+        "cpu_per_request_ms": cpu / len(batches) * 1000,
+        "process_cpu_per_request_ms": own / len(batches) * 1000,
+        "cpu_utilization": cpu / wall,
+        "process_rss_mb": _rss_mb(),
+        "process_peak_rss_mb": max(peak_rss[0], _rss_mb()),
+        "child_peak_rss_mb": _children_peak_rss_mb() if children > 0 else 0.0,
+    }
+
+
+def profile_target(target, batches: list, output_path: str, top: int = 15) -> str:
+    """Profiles the in-process work of a target's requests with cProfile
+
+    Requests are replayed serially in this thread through `target.local`, so the
+    profile covers the scoring code and not the client threads or sockets.
+
+    Args:
+        target (object): One of the TARGETS, already set up
+        batches (list): Request batches to replay
+        output_path (str): Path of the `.prof` file, readable by pstats or snakeviz
+        top (int, optional): Number of functions in the printed summary. Defaults to 15.
+
+    Returns:
+        str: The path of the profile
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    for batch in batches:
+        target.local(batch)
+    profiler.disable()
+    profiler.dump_stats(output_path)
+    pstats.Stats(output_path).sort_stats("cumulative").print_stats(top)
+    return output_path
+
+
+def load_test(
+    modes: list,
+    model_path: str = MODEL_PATH,
+    data_path: str = TEST_DATA_PATH,
+    n_requests: int = 200,
+    cli_requests: int = 4,
+    batch_rows: int = 10,
+    concurrency: int = 1,
+    rate: float = None,
+    synthetic: bool = False,
+    output_dir: str = OUTPUT_PATH,
+    random_state: int = 123,
+    profile_mode: str = None,
+) -> pd.DataFrame:
+    """Runs the load test of every mode and profiles the hottest one
+
+    Every mode replays the same sampled requests. The mode that used the most CPU per
+    request in this process, or `profile_mode` if given, is replayed once more under
+    cProfile. CPU of child processes is left out of that choice, since the profile
+    cannot see them.
+
+    Args:
+        modes (list): Names of the TARGETS to test
+        model_path (str, optional): Path to the saved model file. Defaults to MODEL_PATH.
+        data_path (str, optional): Labelled csv file the rows are sampled from, also
+            the canary data of the HTTP stand-in. Defaults to TEST_DATA_PATH.
+        n_requests (int, optional): Requests per mode. Defaults to 200.
+        cli_requests (int, optional): Requests for the batch mode, where every request
+            starts a new process. Defaults to 4.
+        batch_rows (int, optional): Rows per request. Defaults to 10.
+        concurrency (int, optional): Number of client threads. Defaults to 1.
+        rate (float, optional): Requests per second, None for a closed loop.
+            Defaults to None.
+        synthetic (bool, optional): Replay synthetic rows instead of test rows.
+            Defaults to False.
+        output_dir (str, optional): Folder for the results and the profile.
+            Defaults to OUTPUT_PATH.
+        random_state (int, optional): Seed of the row sampler. Defaults to 123.
+        profile_mode (str, optional): Mode to profile instead of the hottest one.
+            Defaults to None.
+
+    Returns:
+        pd.DataFrame: One row of measurements per mode, also saved as results.csv
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rows = sample_rows(
+        n_requests * batch_rows, data_path, synthetic=synthetic, random_state=random_state
+    )
+    batches = [rows.iloc[i : i + batch_rows] for i in range(0, len(rows), batch_rows)]
+
+    results = []
+    for mode in modes:
+        target = TARGETS[mode](model_path, data_path)
+        try:
+            mode_batches = batches[:cli_requests] if mode == "batch" else batches
+            target.send(mode_batches[0])  # warm-up request, not measured
+            result = run_load(target, mode_batches, concurrency=concurrency, rate=rate)
+        finally:
+            target.close()
+        results.append(result)
+    if profile_mode is None:
+        profile_mode = max(results, key=lambda r: r["process_cpu_per_request_ms"])["mode"]
+
+    results_df = pd.DataFrame(results)
+    results_df.to_csv(os.path.join(output_dir, "results.csv"), index=False)
+
+    target = TARGETS[profile_mode](model_path, data_path)
+    try:
+        profile_batches = batches[:cli_requests] if profile_mode == "batch" else batches
+        profile_path = os.path.join(output_dir, f"{profile_mode}.prof")
+        profile_target(target, profile_batches, profile_path)
+    finally:
+        target.close()
+    print(f"Profile of the {profile_mode} mode saved to '{profile_path}'.")
+    return results_df
+
+
+@click.command()
+@click.option("--modes", type=str, default="direct,http,batch", help="Comma separated modes")
+@click.option("--model_path", type=str, default=MODEL_PATH, help="Model file path")
+@click.option("--data_path", type=str, default=TEST_DATA_PATH, help="Csv file to sample rows from")
+@click.option("--requests", "n_requests", type=int, default=200, help="Requests per mode")
+@click.option("--cli_requests", type=int, default=4, help="Requests for the batch CLI mode")
+@click.option("--batch_rows", type=int, default=10, help="Rows per request")
+@click.option("--concurrency", type=int, default=1, help="Number of client threads")
+@click.option("--rate", type=float, default=None, help="Requests per second, open loop")
+@click.option("--synthetic", is_flag=True, help="Replay synthetic rows instead of test rows")
+@click.option("--output_dir", type=str, default=OUTPUT_PATH, help="Folder for the results")
+@click.option("--profile_mode", type=str, default=None, help="Mode to profile, default hottest")
+def main(
+    modes,
+    model_path,
+    data_path,
+    n_requests,
+    cli_requests,
+    batch_rows,
+    concurrency,
+    rate,
+    synthetic,
+    output_dir,
+    profile_mode,
+):
+    """
+    Main function to load test the inference path and print the measurements.
+
+    Args:
+        modes (str): Comma separated modes out of direct, http and batch.
+        model_path (str): Path to the saved model file.
+        data_path (str): Labelled csv file to sample rows from.
+        n_requests (int): Requests per mode.
+        cli_requests (int): Requests for the batch CLI mode.
+        batch_rows (int): Rows per request.
+        concurrency (int): Number of client threads.
+        rate (float): Requests per second, None for a closed loop.
+        synthetic (bool): Replay synthetic rows instead of test rows.
+        output_dir (str): Folder for the results and the profile.
+        profile_mode (str): Mode to profile, None for the hottest one.
+    """
+    results_df = load_test(
+        [mode.strip() for mode in modes.split(",") if mode.strip()],
+        model_path=model_path,
+        data_path=data_path,
+        n_requests=n_requests,
+        cli_requests=cli_requests,
+        batch_rows=batch_rows,
+        concurrency=concurrency,
+        rate=rate,
+        synthetic=synthetic,
+        output_dir=output_dir,
+        profile_mode=profile_mode,
+    )
+    print("Table 1: Load test results:")
+    print(results_df.round(3).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""This module contains a mergeable confusion matrix accumulator from which the accuracy
+and the classification report are derived, so evaluation can run over streamed chunks"""
+
+import numpy as np
+import pandas as pd
+
+
+class ConfusionAccumulator:
+    """Confusion matrix built up chunk by chunk with `np.bincount`
+
+    Labels are kept sorted and the matrix grows when a chunk brings unseen labels, so
+    accumulators filled by different workers can be merged.
+
+    Args:
+        labels (array-like, optional): Labels known up front. Defaults to None.
+    """
+
+    def __init__(self, labels=None):
+        self.labels = np.unique(np.asarray([] if labels is None else labels))
+        self.counts = np.zeros((len(self.labels), len(self.labels)), dtype=np.int64)
+
+    def _add_labels(self, new_labels: np.ndarray):
+        """Grows the matrix to hold the union of the current and new labels"""
+        # An empty label array is float, so it must not take part in the union
+        if self.labels.size:
+            labels = np.union1d(self.labels, new_labels)
+        else:
+            labels = np.unique(new_labels)
+        if len(labels) == len(self.labels):
+            return
+        positions = np.searchsorted(labels, self.labels)
+        counts = np.zeros((len(labels), len(labels)), dtype=np.int64)
+        counts[np.ix_(positions, positions)] = self.counts
+        self.labels, self.counts = labels, counts
+
+    def update(self, y_true, y_pred):
+        """Adds a chunk of true and predicted labels
+
+        Args:
+            y_true (array-like): True labels
+            y_pred (array-like): Predicted labels
+
+        Returns:
+            ConfusionAccumulator: self, so calls can be chained
+        """
+        y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+        self._add_labels(np.concatenate([y_true, y_pred]))
+
+        n = len(self.labels)
+        pairs = np.searchsorted(self.labels, y_true) * n + np.searchsorted(self.labels, y_pred)
+        self.counts += np.bincount(pairs, minlength=n * n).reshape(n, n)
+        return self
+
+    def merge(self, other: "ConfusionAccumulator"):
+        """Adds the counts of another accumulator, e.g. one filled by another worker
+
+        Args:
+            other (ConfusionAccumulator): Accumulator to merge in
+
+        Returns:
+            ConfusionAccumulator: self, so calls can be chained
+        """
+        if other.labels.size == 0:
+            return self
+        self._add_labels(other.labels)
+        positions = np.searchsorted(self.labels, other.labels)
+        self.counts[np.ix_(positions, positions)] += other.counts
+        return self
+
+    @property
+    def total(self) -> int:
+        """Number of rows seen so far"""
+        return int(self.counts.sum())
+
+    def accuracy(self) -> float:
+        """Share of rows predicted correctly"""
+        return float(np.trace(self.counts) / self.total) if self.total else 0.0
+
+    def report(self) -> pd.DataFrame:
+        """Derives the classification report from the counts
+
+        The layout matches `pd.DataFrame(classification_report(..., output_dict=True))
+        .transpose()`, with precision, recall and F1 set to 0 when undefined.
+
+        Returns:
+            pd.DataFrame: One row per label plus accuracy, macro avg and weighted avg
+        """
+        tp = np.diag(self.counts).astype(np.float64)
+        support = self.counts.sum(axis=1).astype(np.float64)
+        predicted = self.counts.sum(axis=0).astype(np.float64)
+
+        def ratio(num, den):
+            return np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+
+        precision, recall = ratio(tp, predicted), ratio(tp, support)
+        f1 = ratio(2 * precision * recall, precision + recall)
+
+        report_df = pd.DataFrame(
+            {"precision": precision, "recall": recall, "f1-score": f1, "support": support},
+            index=[str(label) for label in self.labels],
+        )
+        weights = support / support.sum() if support.sum() else support
+        scores = report_df[["precision", "recall", "f1-score"]]
+        report_df.loc["accuracy"] = self.accuracy()
+        report_df.loc["macro avg"] = [*scores.mean(), support.sum()]
+        report_df.loc["weighted avg"] = [*(scores.T @ weights), support.sum()]
+        return report_df
+
+    def to_frame(self) -> pd.DataFrame:
+        """Returns the confusion matrix with `Actual`/`Predicted` labelled axes"""
+        return pd.DataFrame(
+            self.counts,
+            columns=[f"Predicted {label}" for label in self.labels],
+            index=[f"Actual {label}" for label in self.labels],
+        )
+
+
+def evaluate_chunks(model, chunks, label: str = "quality") -> ConfusionAccumulator:
+    """Predicts a stream of data chunks and accumulates the confusion matrix
+
+    Args:
+        model (object): Trained machine learning model.
+        chunks (iterable): DataFrames with the features and the target, e.g. from
+            `pd.read_csv(path, chunksize=...)`.
+        label (str, optional): Name of the target column. Defaults to "quality".
+
+    Returns:
+        ConfusionAccumulator: Counts over all chunks.
+    """
+    accumulator = ConfusionAccumulator()
+    for chunk in chunks:
+        accumulator.update(chunk[label], model.predict(chunk.drop(columns=label)))
+    return accumulator
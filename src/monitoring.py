@@ -0,0 +1,205 @@
+"""This script monitors drift and data quality of the scoring stream against the training
+data, using fixed histogram bins so memory stays constant per window"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+import click
+
+sys.path.append("src")
+
+TRAIN_DATA_PATH = "data/processed/wine_train.csv"
+
+
+class DriftMonitor:
+    """Streaming drift monitor over tumbling windows of scoring rows
+
+    Every feature is summarised by counts in fixed bins derived from the training data,
+    plus a missing value count. When a window fills up its drift score per feature is
+    the Kolmogorov-Smirnov distance between the binned window and training
+    distributions, the same statistic FeatureDrift uses offline in validation.py.
+
+    Args:
+        edges (dict): Mapping of feature name to its sorted bin edges
+        reference_counts (dict): Mapping of feature name to the training counts per bin
+        window_size (int, optional): Rows per window. Defaults to 1000.
+        threshold (float, optional): Drift score that raises an alert. Defaults to 0.2.
+        max_missing (float, optional): Share of missing values that raises an alert.
+            Defaults to 0.05.
+        on_alert (callable, optional): Called with every alert dict. Defaults to print.
+    """
+
+    def __init__(
+        self,
+        edges: dict,
+        reference_counts: dict,
+        window_size: int = 1000,
+        threshold: float = 0.2,
+        max_missing: float = 0.05,
+        on_alert=print,
+    ):
+        self.features = list(edges)
+        self.edges = {f: np.asarray(edges[f], dtype=np.float64) for f in self.features}
+        self.reference_cdf = {
+            f: np.cumsum(reference_counts[f]) / np.sum(reference_counts[f])
+            for f in self.features
+        }
+        self.window_size = window_size
+        self.threshold = threshold
+        self.max_missing = max_missing
+        self.on_alert = on_alert
+        self.windows_done = 0
+        self.alerts = []
+        self._reset()
+
+    @classmethod
+    def from_reference(
+        cls, train_df: pd.DataFrame, n_bins: int = 50, label: str = "quality", **kwargs
+    ):
+        """Builds a monitor with equal frequency bins from the training data
+
+        Args:
+            train_df (pd.DataFrame): Training data
+            n_bins (int, optional): Bins per feature. Defaults to 50.
+            label (str, optional): Target column that is not monitored. Defaults to "quality".
+            **kwargs: Passed on to DriftMonitor
+
+        Returns:
+            DriftMonitor: The monitor
+        """
+        edges, counts = {}, {}
+        for feature in train_df.columns.drop(label, errors="ignore"):
+            values = train_df[feature].dropna().to_numpy(dtype=np.float64)
+            edges[feature] = np.unique(np.quantile(values, np.linspace(0, 1, n_bins + 1)))
+            counts[feature] = _bin_counts(values, edges[feature])
+        return cls(edges, counts, **kwargs)
+
+    def _reset(self):
+        """Starts a new empty window"""
+        self.counts = {
+            f: np.zeros(len(self.edges[f]) + 1, dtype=np.int64) for f in self.features
+        }
+        self.missing = {f: 0 for f in self.features}
+        self.rows = 0
+
+    def update(self, batch: pd.DataFrame) -> list:
+        """Adds a batch of scoring rows, closing windows as they fill up
+
+        Args:
+            batch (pd.DataFrame): Scoring rows with the monitored features
+
+        Returns:
+            list: Alerts raised by the windows closed during this update
+        """
+        alerts = []
+        start = 0
+        while start < len(batch):
+            stop = start + min(self.window_size - self.rows, len(batch) - start)
+            chunk = batch.iloc[start:stop]
+            for feature in self.features:
+                values = chunk[feature].to_numpy(dtype=np.float64)
+                nan = np.isnan(values)
+                self.missing[feature] += int(nan.sum())
+                self.counts[feature] += _bin_counts(values[~nan], self.edges[feature])
+            self.rows += len(chunk)
+            start = stop
+            if self.rows >= self.window_size:
+                alerts.extend(self._close_window())
+        return alerts
+
+    def drift_scores(self) -> dict:
+        """Computes the drift score of every feature for the current window
+
+        Returns:
+            dict: Mapping of feature name to its Kolmogorov-Smirnov distance
+        """
+        scores = {}
+        for feature in self.features:
+            total = self.counts[feature].sum()
+            if total == 0:
+                scores[feature] = 0.0
+                continue
+            window_cdf = np.cumsum(self.counts[feature]) / total
+            scores[feature] = float(np.abs(window_cdf - self.reference_cdf[feature]).max())
+        return scores
+
+    def quantile(self, feature: str, q: float) -> float:
+        """Approximates a quantile of the current window from its bin counts
+
+        Args:
+            feature (str): Feature name
+            q (float): Quantile between 0 and 1
+
+        Returns:
+            float: The interpolated quantile, nan for an empty window
+        """
+        counts = self.counts[feature]
+        if counts.sum() == 0:
+            return float("nan")
+        # Values outside the training range are pinned to the outer edges
+        cdf = np.cumsum(counts)[:-1] / counts.sum()
+        return float(np.interp(q, cdf, self.edges[feature]))
+
+    def _close_window(self) -> list:
+        """Scores the full window, raises alerts and starts a new one"""
+        alerts = []
+        for feature, score in self.drift_scores().items():
+            missing_share = self.missing[feature] / self.rows
+            if score >= self.threshold:
+                alerts.append(("drift", feature, score))
+            if missing_share > self.max_missing:
+                alerts.append(("missing", feature, missing_share))
+        alerts = [
+            {"window": self.windows_done, "feature": feature, "check": check, "value": value}
+            for check, feature, value in alerts
+        ]
+        for alert in alerts:
+            self.on_alert(alert)
+        self.alerts.extend(alerts)
+        self.windows_done += 1
+        self._reset()
+        return alerts
+
+
+def _bin_counts(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Counts values per bin, with one extra bin below and above the edges
+
+    Args:
+        values (np.ndarray): Values without missing entries
+        edges (np.ndarray): Sorted bin edges
+
+    Returns:
+        np.ndarray: Counts of length len(edges) + 1
+    """
+    # Bin i holds edges[i - 1] < v <= edges[i], so the lowest training value lands in bin 1
+    positions = np.searchsorted(edges, values, side="left")
+    positions[(positions == 0) & (values == edges[0])] = 1
+    return np.bincount(positions, minlength=len(edges) + 1)
+
+
+@click.command()
+@click.option("--reference", type=str, default=TRAIN_DATA_PATH, help="Training data path")
+@click.option("--stream", type=str, help="Csv file with scoring rows to replay")
+@click.option("--window_size", type=int, default=1000, help="Rows per monitoring window")
+@click.option("--threshold", type=float, default=0.2, help="Drift score that raises an alert")
+def main(reference, stream, window_size, threshold):
+    """
+    Replay a csv file through the drift monitor in chunks and print the alerts.
+
+    Args:
+        reference (str): Path to the training data.
+        stream (str): Path to the csv file with scoring rows.
+        window_size (int): Rows per monitoring window.
+        threshold (float): Drift score that raises an alert.
+    """
+    monitor = DriftMonitor.from_reference(
+        pd.read_csv(reference), window_size=window_size, threshold=threshold
+    )
+    for chunk in pd.read_csv(stream, chunksize=window_size):
+        monitor.update(chunk)
+    print(f"{monitor.windows_done} windows checked, {len(monitor.alerts)} alerts raised")
+
+
+if __name__ == "__main__":
+    main()
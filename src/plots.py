@@ -5,13 +5,14 @@ import sys
 import altair as alt
 import pandas as pd
 import pandas as pd
-from sklearn.metrics import confusion_matrix
 import pandas as pd
 import altair as alt
 import click
 
 from data_training import load_model
 from data_download import create_data_folder
+from metrics import ConfusionAccumulator
+from resources import stage_resources, RESOURCE_LOG_PATH
 
 sys.path.append("src")
 
@@ -72,18 +73,8 @@ def make_confusion_matrix(y_test_df, y_pred, img_path):
         img_path (str): Path to save the confusion matrix visualization.
     """
     y_test = y_test_df["quality"]
-    # Dynamically determine class labels from both y_test and y_test_pred
-    class_labels = sorted(set(y_test).union(set(y_pred)))
-
-    # Compute confusion matrix
-    cm = confusion_matrix(y_test, y_pred, labels=class_labels)
-
-    # Create a DataFrame with dynamic labels for multi-class
-    cm_df = pd.DataFrame(
-        cm,
-        columns=[f"Predicted {label}" for label in class_labels],
-        index=[f"Actual {label}" for label in class_labels],
-    ).reset_index()
+    # Class labels are determined from both y_test and y_pred by the accumulator
+    cm_df = ConfusionAccumulator().update(y_test, y_pred).to_frame().reset_index()
 
     # Convert to long format for Altair
     cm_melted = cm_df.melt(id_vars="index", var_name="Predicted", value_name="Count")
@@ -164,14 +155,15 @@ def main(img_path, train_data_path, test_data_path):
     train_data = pd.read_csv(train_data_path)
     features_df = pd.read_csv(FEATURES_PATH)
 
-    # make test pred
-    test_pred = perform_test(test_data, model)
+    with stage_resources("plots", log_path=RESOURCE_LOG_PATH):
+        # make test pred
+        test_pred = perform_test(test_data, model)
 
-    save_eda_viz(train_data, IMAGE_FOLDER)
+        save_eda_viz(train_data, IMAGE_FOLDER)
 
-    make_confusion_matrix(test_data, test_pred, IMAGE_FOLDER)
+        make_confusion_matrix(test_data, test_pred, IMAGE_FOLDER)
 
-    save_feature_importance_viz(features_df, IMAGE_FOLDER)
+        save_feature_importance_viz(features_df, IMAGE_FOLDER)
 
 
 if __name__ == "__main__":
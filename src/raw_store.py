@@ -0,0 +1,215 @@
+"""This script keeps the raw data as an append-only store of immutable partitions. A
+persistent row hash index deduplicates every new batch against all stored rows without
+reading the stored partitions again, so ingest cost grows with the batch"""
+
+import os
+import sys
+import json
+
+import numpy as np
+import pandas as pd
+import click
+
+from hashing import row_bits, hash_rows, find_duplicate_rows
+
+sys.path.append("src")
+
+STORE_PATH = "data/raw/store"
+MANIFEST_FILE_NAME = "manifest.json"
+
+
+def _write_atomic(path: str, write):
+    """Writes a file through a temporary file so readers never see a partial file
+
+    Args:
+        path (str): Final file path
+        write (callable): Called with the open binary temporary file
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+class RawStore:
+    """Append-only store of raw rows in immutable column-major `.npy` partitions
+
+    Every partition holds the canonical float64 values of the rows it added (see
+    `hashing.row_bits`) in column-major order, so single columns and single rows can
+    be read through a memory map. Next to it an index segment keeps the sorted 64 bit
+    hashes of its rows and the row each one belongs to. Segments are never rewritten,
+    and lookups binary search them through memory maps.
+
+    Args:
+        root (str, optional): Folder of the store. Defaults to STORE_PATH.
+    """
+
+    def __init__(self, root: str = STORE_PATH):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        manifest_path = os.path.join(root, MANIFEST_FILE_NAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"columns": None, "dtypes": None, "partitions": []}
+        self._load_index()
+
+    @property
+    def partitions(self) -> list:
+        """Names of the stored partitions in the order they were ingested"""
+        return [p["name"] for p in self.manifest["partitions"]]
+
+    @property
+    def rows(self) -> int:
+        """Number of stored rows"""
+        return sum(p["rows"] for p in self.manifest["partitions"])
+
+    def _path(self, name: str, kind: str) -> str:
+        """Path of the values, hashes or rows file of a partition"""
+        return os.path.join(self.root, f"{name}.{kind}.npy")
+
+    def _load_index(self):
+        """Memory maps the index segments of all partitions
+
+        The manifest is written last on ingest, so every partition it lists has its
+        values and segment. A segment that went missing anyway is rebuilt from the
+        values of its partition.
+        """
+        self._segments = []
+        for name in self.partitions:
+            if not os.path.exists(self._path(name, "rows")):
+                values = np.load(self._path(name, "values"), mmap_mode="r")
+                self._write_segment(name, hash_rows(np.asarray(values)))
+            self._segments.append(self._open_segment(name))
+
+    def _open_segment(self, name: str) -> tuple:
+        """Memory maps the sorted hashes and rows of a partition"""
+        return (
+            np.load(self._path(name, "hashes"), mmap_mode="r"),
+            np.load(self._path(name, "rows"), mmap_mode="r"),
+        )
+
+    def _write_segment(self, name: str, hashes: np.ndarray):
+        """Writes the sorted hashes of a partition and the row of each hash"""
+        order = np.argsort(hashes, kind="stable")
+        _write_atomic(self._path(name, "hashes"), lambda f: np.save(f, hashes[order]))
+        # The rows file is written last and marks the segment as complete
+        _write_atomic(self._path(name, "rows"), lambda f: np.save(f, order))
+
+    def _stored_bits(self, number: int, rows: np.ndarray) -> np.ndarray:
+        """Reads the bits of some rows of a partition, touching only those rows"""
+        values = np.load(self._path(self.partitions[number], "values"), mmap_mode="r")
+        return row_bits(np.asarray(values[rows]))
+
+    def _is_stored(self, bits: np.ndarray, hashes: np.ndarray) -> np.ndarray:
+        """Flags the rows whose exact values are already in the store
+
+        Rows are looked up by hash in every segment, and only rows whose hash is found
+        are compared exactly, so the cost grows with the batch and not with the store.
+        """
+        stored = np.zeros(len(hashes), dtype=bool)
+        for number, (segment_hashes, segment_rows) in enumerate(self._segments):
+            left = np.searchsorted(segment_hashes, hashes, side="left")
+            right = np.searchsorted(segment_hashes, hashes, side="right")
+            candidates = np.flatnonzero((right > left) & ~stored)
+            for offset in range(int((right - left).max(initial=0))):
+                # Rows that collide with several stored rows take several rounds
+                candidates = candidates[left[candidates] + offset < right[candidates]]
+                if len(candidates) == 0:
+                    break
+                rows = np.asarray(segment_rows[left[candidates] + offset])
+                same = (self._stored_bits(number, rows) == bits[candidates]).all(axis=1)
+                stored[candidates[same]] = True
+                candidates = candidates[~same]
+        return stored
+
+    def ingest(self, data: pd.DataFrame) -> dict:
+        """Appends the rows of a batch that are not stored yet as a new partition
+
+        Args:
+            data (pd.DataFrame): Numeric batch with the columns of the store in any order
+
+        Raises:
+            ValueError: When the batch columns differ from the stored columns
+
+        Returns:
+            dict: Name of the new partition (None if every row was a duplicate), number
+                of rows added and number of duplicate rows skipped
+        """
+        if self.manifest["columns"] is None:
+            self.manifest["columns"] = [str(c) for c in data.columns]
+            self.manifest["dtypes"] = [str(t) for t in data.dtypes]
+        columns = self.manifest["columns"]
+        if sorted(map(str, data.columns)) != sorted(columns):
+            raise ValueError(f"Batch columns {list(data.columns)} differ from {columns}")
+
+        bits = row_bits(data[columns])
+        hashes = hash_rows(bits.view(np.float64))
+        new = ~find_duplicate_rows(bits.view(np.float64))
+        new[new] = ~self._is_stored(bits[new], hashes[new])
+
+        result = {
+            "partition": None,
+            "rows": int(new.sum()),
+            "duplicates": int((~new).sum()),
+        }
+        if not new.any():
+            return result
+
+        name = f"part-{len(self.manifest['partitions']):05d}"
+        values = np.asfortranarray(bits[new].view(np.float64))
+        _write_atomic(self._path(name, "values"), lambda f: np.save(f, values))
+        self._write_segment(name, hashes[new])
+        self.manifest["partitions"].append({"name": name, "rows": len(values)})
+        manifest = json.dumps(self.manifest, indent=2).encode()
+        _write_atomic(
+            os.path.join(self.root, MANIFEST_FILE_NAME), lambda f: f.write(manifest)
+        )
+        self._segments.append(self._open_segment(name))
+
+        result["partition"] = name
+        return result
+
+    def read(self, partitions: list = None) -> pd.DataFrame:
+        """Reads stored partitions back into a dataframe with the original dtypes
+
+        Args:
+            partitions (list, optional): Partition names to read. Defaults to all.
+
+        Returns:
+            pd.DataFrame: The rows of the partitions in ingest order
+        """
+        names = self.partitions if partitions is None else partitions
+        columns = self.manifest["columns"] or []
+        values = [np.load(self._path(name, "values")) for name in names]
+        data = pd.DataFrame(
+            np.concatenate(values) if values else np.empty((0, len(columns))),
+            columns=columns,
+        )
+        return data.astype(dict(zip(columns, self.manifest["dtypes"] or [])))
+
+
+@click.command()
+@click.argument("paths", nargs=-1, required=True)
+@click.option("--store_path", type=str, default=STORE_PATH, help="Folder of the raw store")
+def main(paths, store_path):
+    """
+    Ingest raw csv files into the append-only raw store.
+
+    Args:
+        paths (tuple): Csv files to ingest, one partition per file with new rows.
+        store_path (str): Folder of the raw store.
+    """
+    store = RawStore(store_path)
+    for path in paths:
+        result = store.ingest(pd.read_csv(path))
+        print(
+            f"Ingested '{path}': {result['rows']} new rows, "
+            f"{result['duplicates']} duplicates, partition {result['partition']}"
+        )
+    print(f"The store holds {store.rows} rows in {len(store.partitions)} partitions.")
+
+
+if __name__ == "__main__":
+    main()
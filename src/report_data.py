@@ -0,0 +1,160 @@
+"""This script exports every number and table the report needs into one versioned json
+bundle, so rendering the report never has to re-run the Python pipeline stages"""
+
+import sys
+import os
+import json
+
+import janitor  # registers DataFrame.clean_names used by clean_data
+import numpy as np
+import pandas as pd
+import click
+
+from data_training import load_model
+from metrics import ConfusionAccumulator
+from validation import clean_data, validate_processed_data
+
+sys.path.append("src")
+
+# Bump whenever the layout of the bundle changes, the report refuses other versions
+REPORT_DATA_VERSION = 1
+REPORT_DATA_PATH = "data/processed/report_data.json"
+
+
+def _histograms(train_df: pd.DataFrame, n_bins: int) -> dict:
+    """Computes fixed width histogram bins for every column of the training data
+
+    Args:
+        train_df (pd.DataFrame): Training dataset.
+        n_bins (int): Number of bins per column.
+
+    Returns:
+        dict: Mapping of column name to its bin edges and counts
+    """
+    histograms = {}
+    for column in train_df.columns:
+        counts, edges = np.histogram(train_df[column].dropna(), bins=n_bins)
+        histograms[column] = {"edges": edges.tolist(), "counts": counts.tolist()}
+    return histograms
+
+
+def build_report_data(
+    raw_df: pd.DataFrame,
+    train_df: pd.DataFrame,
+    test_df: pd.DataFrame,
+    model,
+    feature_importances: pd.DataFrame,
+    n_bins: int = 40,
+) -> dict:
+    """
+    Collect the metrics, tables and plot data used by the report.
+
+    Args:
+        raw_df (pd.DataFrame): Raw dataset as downloaded.
+        train_df (pd.DataFrame): Training dataset.
+        test_df (pd.DataFrame): Test dataset.
+        model: Trained machine learning model.
+        feature_importances (pd.DataFrame): Feature names and their importance values.
+        n_bins (int, optional): Number of histogram bins per feature. Defaults to 40.
+
+    Returns:
+        dict: The report data bundle.
+    """
+    clean_df = clean_data(raw_df)
+
+    y_pred = model.predict(test_df.drop(columns="quality"))
+    confusion = ConfusionAccumulator().update(test_df["quality"], y_pred)
+    report_df = confusion.report()
+
+    return {
+        "version": REPORT_DATA_VERSION,
+        "dataset": {
+            "total_samples": len(clean_df),
+            "features": clean_df.columns.drop("quality").tolist(),
+            "quality_levels": sorted(int(q) for q in clean_df["quality"].unique()),
+        },
+        "validation": {
+            "raw_rows": len(raw_df),
+            "duplicates_removed": len(raw_df) - len(clean_df),
+            "missing_cells": int(clean_df.isna().sum().sum()),
+            "schema_valid": bool(validate_processed_data(clean_df)),
+        },
+        "model": {
+            key: value
+            for key, value in model.get_params().items()
+            if key in ("max_depth", "max_features", "min_samples_leaf", "min_samples_split")
+        },
+        "metrics": {
+            "accuracy": confusion.accuracy(),
+            "classification_report": report_df.reset_index(names="label").to_dict(
+                orient="records"
+            ),
+        },
+        "confusion": {
+            "labels": [int(label) for label in confusion.labels],
+            "counts": confusion.counts.tolist(),
+        },
+        "importance": feature_importances.to_dict(orient="records"),
+        "histograms": _histograms(train_df, n_bins),
+    }
+
+
+def write_report_data(bundle: dict, path: str) -> bool:
+    """Writes the bundle only when its content changed
+
+    Leaving an unchanged file untouched keeps its modification time, so make does not
+    re-render the report when only an upstream timestamp moved.
+
+    Args:
+        bundle (dict): The report data bundle.
+        path (str): Output path of the json file.
+
+    Returns:
+        bool: True if the file was written
+    """
+    content = json.dumps(bundle, sort_keys=True, separators=(",", ":"), default=float)
+    if os.path.exists(path):
+        with open(path) as f:
+            if f.read() == content:
+                print(f"Report data in '{path}' is unchanged.")
+                return False
+
+    with open(path, "w") as f:
+        f.write(content)
+    print(f"Report data saved as '{path}'.")
+    return True
+
+
+@click.command()
+@click.option("--raw_data", type=str, help="Path to read the raw data")
+@click.option("--train_data", type=str, help="Path to read the train data")
+@click.option("--test_data", type=str, help="Path to read the test data")
+@click.option("--model_path", type=str, help="Path to the saved model file")
+@click.option("--features_path", type=str, help="Path to the feature importance csv")
+@click.option(
+    "--output", type=str, default=REPORT_DATA_PATH, help="Path to write the bundle"
+)
+def main(raw_data, train_data, test_data, model_path, features_path, output):
+    """
+    Main function to export the report data bundle.
+
+    Args:
+        raw_data (str): Path to the raw data.
+        train_data (str): Path to the training data.
+        test_data (str): Path to the test data.
+        model_path (str): Path to the saved model file.
+        features_path (str): Path to the feature importance csv.
+        output (str): Path to write the bundle.
+    """
+    bundle = build_report_data(
+        pd.read_csv(raw_data),
+        pd.read_csv(train_data),
+        pd.read_csv(test_data),
+        load_model(model_path),
+        pd.read_csv(features_path),
+    )
+    write_report_data(bundle, output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""This module holds the central CPU budget of the pipeline. Every parallel stage runs
+inside `stage_resources`, which caps its worker processes and the BLAS/OpenMP threads
+per process so stages do not oversubscribe the machine or the container"""
+
+import os
+import sys
+import json
+import time
+import resource
+from contextlib import contextmanager
+
+from joblib import parallel_config
+from threadpoolctl import threadpool_limits
+
+sys.path.append("src")
+
+RESOURCE_LOG_PATH = "data/processed/resource_usage.jsonl"
+
+# Environment variable that overrides the detected number of CPUs
+CPU_LIMIT_ENV = "WINE_CPU_LIMIT"
+
+# Worker processes and threads per worker of every stage, None means all available CPUs.
+# Stages with several workers run single threaded native code in each of them.
+STAGE_LIMITS = {
+    "validation": {"n_jobs": 1, "threads": None},
+    "validation_batch": {"n_jobs": None, "threads": 1},
+    "training": {"n_jobs": None, "threads": 1},
+    "evaluation": {"n_jobs": None, "threads": 1},
+    "plots": {"n_jobs": 1, "threads": 1},
+    "inference": {"n_jobs": None, "threads": 1},
+}
+
+
+def _cgroup_cpus() -> float:
+    """Reads the CPU quota of the current cgroup, None when there is no quota
+
+    Both cgroup v2 (`cpu.max`) and v1 (`cpu.cfs_quota_us`) are supported.
+    """
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus() -> int:
+    """Returns the number of CPUs this process may use
+
+    This is the smallest of the CPU affinity mask, the cgroup CPU quota (e.g. from
+    `docker run --cpus` or a compose `cpus` limit) and the WINE_CPU_LIMIT environment
+    variable, and at least 1.
+
+    Returns:
+        int: Number of usable CPUs
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_cpus()
+    if quota is not None:
+        cpus = min(cpus, int(quota))
+    if os.environ.get(CPU_LIMIT_ENV):
+        cpus = min(cpus, int(os.environ[CPU_LIMIT_ENV]))
+    return max(cpus, 1)
+
+
+def stage_limits(stage: str) -> tuple:
+    """Resolves the worker and thread counts of a stage against the available CPUs
+
+    Args:
+        stage (str): Stage name, one of STAGE_LIMITS
+
+    Returns:
+        tuple: (n_jobs, threads) with n_jobs * threads at most the available CPUs
+    """
+    cpus = available_cpus()
+    limits = STAGE_LIMITS[stage]
+    threads = min(limits["threads"] or cpus, cpus)
+    n_jobs = min(limits["n_jobs"] or cpus // threads, cpus // threads)
+    return max(n_jobs, 1), threads
+
+
+def _cpu_seconds() -> float:
+    """Returns the CPU time used by this process and its finished children"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return sum(u.ru_utime + u.ru_stime for u in (own, children))
+
+
+@contextmanager
+def stage_resources(stage: str, log_path: str = None):
+    """Runs a block with the process and thread caps of a stage and logs its usage
+
+    Inside the block joblib (and so sklearn estimators and `Parallel` calls with
+    `n_jobs=None`) uses the stage's number of workers, and BLAS/OpenMP pools in this
+    process and in the workers are limited to the stage's threads. When the block ends
+    its wall time, CPU time and utilization of the allotted CPUs are printed and, if
+    `log_path` is given, appended to it as a json line.
+
+    Args:
+        stage (str): Stage name, one of STAGE_LIMITS
+        log_path (str, optional): Json lines file for the usage record. Defaults to None.
+
+    Yields:
+        dict: The usage record, filled in when the block ends
+    """
+    n_jobs, threads = stage_limits(stage)
+    record = {"stage": stage, "n_jobs": n_jobs, "threads": threads}
+    start_wall, start_cpu = time.perf_counter(), _cpu_seconds()
+    try:
+        with threadpool_limits(limits=threads), parallel_config(
+            backend="loky", n_jobs=n_jobs, inner_max_num_threads=threads
+        ):
+            yield record
+    finally:
+        wall = time.perf_counter() - start_wall
+        cpu = _cpu_seconds() - start_cpu
+        record.update(
+            wall_seconds=round(wall, 3),
+            cpu_seconds=round(cpu, 3),
+            # Pool workers that outlive the block are not counted, so this is a lower bound
+            utilization=round(cpu / (wall * n_jobs * threads), 3) if wall > 0 else 0.0,
+        )
+        print(
+            f"Stage {stage}: {n_jobs} workers x {threads} threads, "
+            f"{record['wall_seconds']}s wall, {record['utilization']:.0%} utilization"
+        )
+        if log_path is not None:
+            with open(log_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
@@ -0,0 +1,244 @@
+"""This module contains a lightweight row level validator for scoring inputs. It is built
+from the training data when the model is trained and saved next to the model file"""
+
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+META_FILE_NAME = "model_meta.json"
+
+# Prediction given to rejected rows, wine quality scores are never negative
+REJECTED_LABEL = -1
+
+
+class RowValidator:
+    """Checks scoring rows against the columns, column order and ranges seen in training
+
+    All checks are compiled into numpy arrays up front, so validating a batch is a few
+    vectorized comparisons. Rows that fail are split out instead of failing the batch.
+
+    Args:
+        columns (list): Feature columns in the order the model was trained on
+        lower (list): Smallest allowed value per column
+        upper (list): Largest allowed value per column
+    """
+
+    def __init__(self, columns: list, lower: list, upper: list):
+        self.columns = list(columns)
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.upper = np.asarray(upper, dtype=np.float64)
+        # Returned (as a copy) for clean batches, building it per call costs more than the checks
+        empty = {c: pd.Series(dtype=np.float64) for c in self.columns}
+        self._no_rejects = pd.DataFrame({**empty, "reason": pd.Series(dtype=str)})
+
+    @classmethod
+    def from_training(cls, X_train: pd.DataFrame, schema_spec: dict = None):
+        """Builds the validator from the training features
+
+        Bounds come from the `ge`/`le` rules of a schema spec (see
+        `validation.WINE_SCHEMA_SPEC`) when one is given. Otherwise columns that were
+        never negative in training must stay non-negative, and nothing else is bounded.
+
+        Args:
+            X_train (pd.DataFrame): Training features
+            schema_spec (dict, optional): Schema spec with per-column rules. Defaults to None.
+
+        Returns:
+            RowValidator: The validator
+        """
+        lower, upper = [], []
+        for column in X_train.columns:
+            if schema_spec is not None:
+                rule = schema_spec["columns"].get(column, {})
+                lower.append(rule.get("ge", -np.inf))
+                upper.append(rule.get("le", np.inf))
+            else:
+                lower.append(0.0 if X_train[column].min() >= 0 else -np.inf)
+                upper.append(np.inf)
+        return cls(X_train.columns, lower, upper)
+
+    @classmethod
+    def from_model(cls, model):
+        """Builds a validator that only checks the training columns of a fitted model
+
+        Values must be numeric and present but are not bounded. Used for models saved
+        without metadata.
+
+        Args:
+            model (object): Model fitted on a DataFrame
+
+        Raises:
+            ValueError: When the model was fitted without feature names
+
+        Returns:
+            RowValidator: The validator
+        """
+        columns = getattr(model, "feature_names_in_", None)
+        if columns is None:
+            raise ValueError("The model has no feature names to validate rows against")
+        return cls(columns, [-np.inf] * len(columns), [np.inf] * len(columns))
+
+    def to_dict(self) -> dict:
+        """Returns a json serializable description of the validator"""
+        return {
+            "columns": self.columns,
+            "lower": [None if np.isinf(v) else float(v) for v in self.lower],
+            "upper": [None if np.isinf(v) else float(v) for v in self.upper],
+        }
+
+    @classmethod
+    def from_dict(cls, spec: dict):
+        """Rebuilds a validator from the output of `to_dict`"""
+        lower = [-np.inf if v is None else v for v in spec["lower"]]
+        upper = [np.inf if v is None else v for v in spec["upper"]]
+        return cls(spec["columns"], lower, upper)
+
+    def split(self, X: pd.DataFrame, return_mask: bool = False):
+        """Splits a scoring batch into valid and rejected rows
+
+        Extra columns are dropped and the rest are put in training order. Values that
+        are not numeric, missing or out of range reject their row.
+
+        Args:
+            X (pd.DataFrame): Scoring batch
+            return_mask (bool, optional): Also return a boolean array that marks the
+                rejected rows. Defaults to False.
+
+        Raises:
+            ValueError: When the batch is missing one of the training columns
+
+        Returns:
+            tuple: (accepted, rejected) where accepted has the training columns in order
+                and rejected holds the failing rows with a `reason` column, followed by
+                the mask of rejected rows when `return_mask` is set
+        """
+        if list(X.columns) != self.columns:
+            missing = [c for c in self.columns if c not in X.columns]
+            if missing:
+                raise ValueError(f"Scoring batch is missing columns: {missing}")
+            X = X[self.columns]
+
+        try:
+            values = X.to_numpy(dtype=np.float64, na_value=np.nan)
+        except (ValueError, TypeError):
+            # Slow path only for batches that hold strings or other non-numeric values
+            X = X.apply(pd.to_numeric, errors="coerce")
+            values = X.to_numpy(dtype=np.float64, na_value=np.nan)
+
+        nan = np.isnan(values)
+        with np.errstate(invalid="ignore"):
+            out_of_range = (values < self.lower) | (values > self.upper)
+        bad = nan | out_of_range
+        bad_rows = bad.any(axis=1)
+        if not bad_rows.any():
+            return (X, self._no_rejects.copy(), bad_rows)[: 3 if return_mask else 2]
+
+        # Report the first failing column of every rejected row
+        first_bad = bad[bad_rows].argmax(axis=1)
+        is_nan = nan[bad_rows][np.arange(len(first_bad)), first_bad]
+        columns = np.asarray(self.columns)[first_bad]
+        reasons = np.where(is_nan, "missing or non-numeric ", "out of range ")
+        rejected = X[bad_rows].assign(reason=np.char.add(reasons, columns))
+        return (X[~bad_rows], rejected, bad_rows)[: 3 if return_mask else 2]
+
+    def save(self, model_dir: str):
+        """Stores the validator in the metadata file next to the model
+
+        Args:
+            model_dir (str): Folder holding model.pkl
+        """
+        update_model_meta(model_dir, {"schema": self.to_dict()})
+
+    @classmethod
+    def load(cls, model_path: str, model=None):
+        """Loads the validator stored next to a model file
+
+        Args:
+            model_path (str): Path to model.pkl
+            model (object, optional): The loaded model. When no validator is stored, one
+                that checks its training columns is built with `from_model`.
+                Defaults to None.
+
+        Raises:
+            ValueError: When no validator is stored and no model with feature names
+                is given
+
+        Returns:
+            RowValidator: The validator
+        """
+        spec = read_model_meta(os.path.dirname(model_path)).get("schema")
+        if spec is not None:
+            return cls.from_dict(spec)
+        if model is None:
+            raise ValueError(f"No row validator is stored next to '{model_path}'")
+        return cls.from_model(model)
+
+
+def fill_rejected(predictions: np.ndarray, rejected_mask: np.ndarray) -> np.ndarray:
+    """Spreads the predictions of the accepted rows over the whole batch
+
+    Args:
+        predictions (np.ndarray): One prediction per accepted row
+        rejected_mask (np.ndarray): Rejected rows of the batch, from `split`
+
+    Returns:
+        np.ndarray: One prediction per row of the batch, REJECTED_LABEL for rejected rows
+    """
+    if not rejected_mask.any():
+        return predictions
+    predictions = np.asarray(predictions)
+    dtype = predictions.dtype if predictions.dtype.kind in "iuf" else object
+    full = np.full(len(rejected_mask), REJECTED_LABEL, dtype=dtype)
+    full[~rejected_mask] = predictions
+    return full
+
+
+def predict_valid(model, validator: RowValidator, X: pd.DataFrame) -> tuple:
+    """Scores the rows of a batch that pass the validator
+
+    Args:
+        model (object): Trained machine learning model
+        validator (RowValidator): Validator of the model's inputs
+        X (pd.DataFrame): Scoring batch
+
+    Returns:
+        tuple: (predictions, rejected) with one prediction per row of X, REJECTED_LABEL
+            for rejected rows, and the rejected rows with a `reason` column
+    """
+    accepted, rejected, rejected_mask = validator.split(X, return_mask=True)
+    if len(accepted) == 0:
+        predictions = np.empty(0, dtype=np.asarray(model.classes_).dtype)
+    else:
+        predictions = model.predict(accepted)
+    return fill_rejected(predictions, rejected_mask), rejected
+
+
+def read_model_meta(model_dir: str) -> dict:
+    """Reads the metadata file that sits next to model.pkl
+
+    Args:
+        model_dir (str): Folder holding model.pkl
+
+    Returns:
+        dict: The metadata, empty if the file does not exist
+    """
+    meta_path = os.path.join(model_dir, META_FILE_NAME)
+    if not os.path.exists(meta_path):
+        return {}
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def update_model_meta(model_dir: str, values: dict):
+    """Merges values into the metadata file that sits next to model.pkl
+
+    Args:
+        model_dir (str): Folder holding model.pkl
+        values (dict): Top level keys to set
+    """
+    meta = read_model_meta(model_dir)
+    meta.update(values)
+    with open(os.path.join(model_dir, META_FILE_NAME), "w") as f:
+        json.dump(meta, f, indent=2, sort_keys=True)
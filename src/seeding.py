@@ -0,0 +1,159 @@
+"""This module derives the seeds of every pipeline stage from one root seed and computes
+the fingerprints used to check that a training run reproduces the same model"""
+
+import sys
+import json
+import hashlib
+import zlib
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from hashing import hash_rows
+
+sys.path.append("src")
+
+# Seeds used when no root seed is given, so the default pipeline keeps its outputs
+DEFAULT_SEEDS = {
+    "split": 123,
+    "tree": 16,
+    "bootstrap": 123,
+    "permutation": 123,
+}
+
+
+def stage_seed(stage: str, root_seed: int = None) -> int:
+    """Returns the seed of one pipeline stage
+
+    Seeds are derived from the root seed and the stage name only, so they do not depend
+    on the order stages run in or on how many workers run them.
+
+    Args:
+        stage (str): Stage name, e.g. one of DEFAULT_SEEDS
+        root_seed (int, optional): Root seed of the run, None for DEFAULT_SEEDS.
+            Defaults to None.
+
+    Returns:
+        int: A seed below 2**31 that numpy and sklearn both accept
+    """
+    if root_seed is None:
+        return DEFAULT_SEEDS[stage]
+    sequence = np.random.SeedSequence([root_seed, zlib.crc32(stage.encode())])
+    return int(sequence.generate_state(1)[0] >> 1)
+
+
+def stage_seeds(root_seed: int = None) -> dict:
+    """Returns the seeds of all stages in DEFAULT_SEEDS for a root seed"""
+    return {stage: stage_seed(stage, root_seed) for stage in DEFAULT_SEEDS}
+
+
+def _digest(*parts) -> str:
+    """Returns the sha256 hex digest of byte strings and numpy arrays"""
+    sha = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            part = np.ascontiguousarray(part).tobytes()
+        sha.update(part)
+    return sha.hexdigest()
+
+
+def fingerprint_data(data: pd.DataFrame) -> str:
+    """Fingerprints a dataframe by its column names, dtypes and row hashes in order
+
+    Args:
+        data (pd.DataFrame): Numeric dataframe
+
+    Returns:
+        str: sha256 hex digest
+    """
+    header = json.dumps([[str(c), str(t)] for c, t in data.dtypes.items()]).encode()
+    return _digest(header, hash_rows(data))
+
+
+def fingerprint_params(params: dict) -> str:
+    """Fingerprints estimator parameters, e.g. from `model.get_params()`
+
+    Args:
+        params (dict): Parameters with json serializable or repr-able values
+
+    Returns:
+        str: sha256 hex digest
+    """
+    return _digest(json.dumps(params, sort_keys=True, default=repr).encode())
+
+
+def fingerprint_tree(model) -> str:
+    """Fingerprints the structure of a fitted decision tree bit for bit
+
+    Only the arrays that decide predictions are hashed, so the fingerprint does not
+    change with the pickle format.
+
+    Args:
+        model (DecisionTreeClassifier): Fitted tree
+
+    Returns:
+        str: sha256 hex digest
+    """
+    tree = model.tree_
+    return _digest(
+        np.asarray(model.classes_),
+        tree.children_left,
+        tree.children_right,
+        tree.feature,
+        tree.threshold,
+        tree.value,
+    )
+
+
+def model_fingerprints(train_df: pd.DataFrame, model) -> dict:
+    """Fingerprints the training data, parameters and tree of a training run
+
+    Args:
+        train_df (pd.DataFrame): Training data with the target
+        model (DecisionTreeClassifier): Fitted tree
+
+    Returns:
+        dict: Fingerprints keyed by data, params and tree
+    """
+    return {
+        "data": fingerprint_data(train_df),
+        "params": fingerprint_params(model.get_params()),
+        "tree": fingerprint_tree(model),
+    }
+
+
+def reproducibility_meta(train_df: pd.DataFrame, model, root_seed: int = None) -> dict:
+    """Builds the reproducibility entry stored in model_meta.json
+
+    Args:
+        train_df (pd.DataFrame): Training data with the target
+        model (DecisionTreeClassifier): Fitted tree
+        root_seed (int, optional): Root seed of the run. Defaults to None.
+
+    Returns:
+        dict: Root seed, stage seeds, fingerprints and library versions
+    """
+    return {
+        "root_seed": root_seed,
+        "seeds": stage_seeds(root_seed),
+        "fingerprints": model_fingerprints(train_df, model),
+        "versions": {
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "sklearn": sklearn.__version__,
+        },
+    }
+
+
+def compare_fingerprints(expected: dict, actual: dict) -> list:
+    """Lists the fingerprints that differ between two runs
+
+    Args:
+        expected (dict): Fingerprints of the recorded run
+        actual (dict): Fingerprints of the new run
+
+    Returns:
+        list: Names of the mismatching fingerprints, empty when the runs match
+    """
+    return [name for name in expected if expected[name] != actual.get(name)]
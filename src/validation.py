@@ -2,8 +2,13 @@
 
 import sys
 import os
+import json
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from statistics import NormalDist
 
 import click
+import janitor  # registers DataFrame.clean_names used by clean_data
 import pandas as pd
 import numpy as np
 import click
@@ -14,12 +19,39 @@ from deepchecks.tabular import Dataset
 from deepchecks.tabular.checks import FeatureDrift
 
 
-from data_download import create_data_folder
+from data_download import create_data_folder, BATCH_FILE_NAME
+from hashing import find_duplicate_rows, hash_split
+from raw_store import RawStore
+from seeding import stage_seed
+from threadpoolctl import threadpool_limits
+from resources import stage_limits, stage_resources, RESOURCE_LOG_PATH
 
 sys.path.append("src")
 # python src/data_download.py --folder_path="data2/raw" --data_id=186
 RAW_DATA_PATH = "data/raw/wine_quality_combined.csv"
 PROCESSED_FOLDER_PATH = "data/processed"
+# Per-partition statistics of the raw store, kept next to the processed data
+STORE_STATS_FILE_NAME = "store_stats.json"
+
+# Column rules for the wine quality dataset (UCI id 186), see build_schema
+WINE_SCHEMA_SPEC = {
+    "target": "quality",
+    "max_class_share": 0.5,
+    "columns": {
+        "fixed_acidity": {"dtype": "float", "ge": 0},
+        "volatile_acidity": {"dtype": "float", "ge": 0},
+        "citric_acid": {"dtype": "float", "ge": 0},
+        "residual_sugar": {"dtype": "float", "ge": 0},
+        "chlorides": {"dtype": "float", "ge": 0},
+        "free_sulfur_dioxide": {"dtype": "float", "ge": 0},
+        "total_sulfur_dioxide": {"dtype": "float", "ge": 0},
+        "density": {"dtype": "float", "ge": 0},
+        "ph": {"dtype": "float", "ge": 0, "le": 14},
+        "sulphates": {"dtype": "float", "ge": 0},
+        "alcohol": {"dtype": "float", "ge": 0},
+        "quality": {"dtype": "int", "isin": [3, 4, 5, 6, 7, 8, 9]},
+    },
+}
 
 
 def check_corr_feats(df: pd.DataFrame):
@@ -36,6 +68,140 @@ def check_corr_feats(df: pd.DataFrame):
     return aa.all().all()
 
 
+def reservoir_sample(chunks, sample_size: int, random_state: int = 123) -> np.ndarray:
+    """Draws a uniform sample of rows from a stream of arrays using reservoir sampling
+
+    Args:
+        chunks (iterable): Iterable of 2D numpy arrays with the same number of columns
+        sample_size (int): Maximum number of rows kept in the reservoir
+        random_state (int, optional): Seed for the sampler. Defaults to 123.
+
+    Returns:
+        np.ndarray: The sampled rows, at most `sample_size` of them
+    """
+    rng = np.random.default_rng(random_state)
+    reservoir = None
+    seen = 0
+    for chunk in chunks:
+        if reservoir is None:
+            reservoir = np.empty((sample_size, chunk.shape[1]), dtype=np.float64)
+        # Fill the reservoir first, then replace slots with probability k / (i + 1)
+        fill = min(max(sample_size - seen, 0), len(chunk))
+        reservoir[seen : seen + fill] = chunk[:fill]
+        rest = chunk[fill:]
+        if len(rest):
+            positions = np.arange(seen + fill, seen + len(chunk))
+            slots = rng.integers(0, positions + 1)
+            keep = slots < sample_size
+            # later rows win when two rows land in the same slot, as in the sequential algorithm
+            rows = np.flatnonzero(keep)[::-1]
+            slots, first = np.unique(slots[rows], return_index=True)
+            reservoir[slots] = rest[rows[first]]
+        seen += len(chunk)
+    if reservoir is None:
+        return np.empty((0, 0))
+    return reservoir[: min(seen, sample_size)]
+
+
+def _corr_bounds(
+    df: pd.DataFrame, sample_size: int, tolerance: float, random_state: int
+):
+    """Estimates bounds on the absolute correlations of a dataframe from a row sample
+
+    The bounds use the Fisher z transform with a Bonferroni correction over all column
+    pairs, so every bound holds at the same time with probability at least 1 - tolerance.
+
+    Args:
+        df (pd.DataFrame): Dataframe that the correlation is estimated on
+        sample_size (int): Number of rows in the reservoir sample
+        tolerance (float): Allowed probability that any bound is wrong
+        random_state (int): Seed for the sampler
+
+    Returns:
+        tuple: (lower, upper, exact) where lower and upper are DataFrames of bounds on
+            the absolute correlation and exact is True if every row was used
+    """
+    if len(df) <= sample_size:
+        corr = df.corr().abs()
+        return corr, corr, True
+
+    chunk_rows = 65536
+    chunks = (
+        df.iloc[start : start + chunk_rows].to_numpy(dtype=np.float64)
+        for start in range(0, len(df), chunk_rows)
+    )
+    sample = pd.DataFrame(
+        reservoir_sample(chunks, sample_size, random_state), columns=df.columns
+    )
+    corr = sample.corr().clip(-1, 1)
+
+    n_eff = len(sample) - sample.isna().sum().max()
+    n_pairs = max(len(df.columns) * (len(df.columns) - 1) // 2, 1)
+    z_crit = NormalDist().inv_cdf(1 - tolerance / (2 * n_pairs))
+    z = np.arctanh(corr.clip(-0.999999, 0.999999))
+    half_width = z_crit / np.sqrt(max(n_eff - 3, 1))
+    low, high = np.tanh(z - half_width), np.tanh(z + half_width)
+
+    upper = np.maximum(low.abs(), high.abs())
+    lower = np.minimum(low.abs(), high.abs()).where(np.sign(low) == np.sign(high), 0)
+    return lower, upper, False
+
+
+def approx_corr_feats(
+    df: pd.DataFrame,
+    threshold: float = 0.9,
+    sample_size: int = 10_000,
+    tolerance: float = 0.05,
+    random_state: int = 123,
+    target: str = None,
+):
+    """Approximate version of check_corr_feats for very large dataframes
+
+    The correlations are estimated on a reservoir sample. When the confidence bounds
+    do not settle the check either way, the exact correlation is computed instead.
+
+    Args:
+        df (pd.DataFrame): Dataframe that the correlation is checked
+        threshold (float, optional): Maximum allowed absolute correlation. Defaults to 0.9.
+        sample_size (int, optional): Rows used for the estimate. Defaults to 10_000.
+        tolerance (float, optional): Allowed probability of a wrong verdict. Defaults to 0.05.
+        random_state (int, optional): Seed for the sampler. Defaults to 123.
+        target (str, optional): Only check correlations against this column. Defaults to None.
+
+    Returns:
+        tuple: (passed, certain) where certain is False when the verdict is only probable
+    """
+    lower, upper, exact = _corr_bounds(df, sample_size, tolerance, random_state)
+    np.fill_diagonal(lower.values, 0)
+    np.fill_diagonal(upper.values, 0)
+    if target is not None:
+        lower, upper = lower[target].drop(target), upper[target].drop(target)
+
+    if (upper < threshold).all().all():
+        return True, exact
+    if (lower >= threshold).any().any():
+        return False, exact
+
+    # The sample cannot decide, so fall back to the exact computation
+    if target is not None:
+        return bool((df.corr()[target].abs().drop(target) < threshold).all()), True
+    return bool(check_corr_feats(df)), True
+
+
+def has_duplicate_rows(df: pd.DataFrame) -> bool:
+    """Checks for duplicate rows using a vectorized row hash instead of `df.duplicated()`
+
+    Args:
+        df (pd.DataFrame): Dataframe that is checked
+
+    Returns:
+        bool: True if any row appears more than once
+    """
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes):
+        return bool(df.duplicated().any())
+    return bool(find_duplicate_rows(df).any())
+
+
 # Uses janitor to clean column names
 
 
@@ -57,36 +223,127 @@ def clean_data(data: pd.DataFrame) -> pd.DataFrame:
     return data
 
 
-def validate_processed_data(data: pd.DataFrame) -> pd.DataFrame:
+def infer_schema_spec(data: pd.DataFrame, target: str) -> dict:
+    """Infers a schema spec for a dataset that has no entry in the schema config
+
+    Numeric columns that are never negative get a `ge: 0` rule and an integer target
+    with few levels is restricted to the levels that were observed.
+
+    Args:
+        data (pd.DataFrame): The cleaned data the spec is inferred from
+        target (str): Name of the target column
+
+    Returns:
+        dict: A schema spec in the same format as WINE_SCHEMA_SPEC
+    """
+    columns = {}
+    for name in data.columns:
+        series = data[name]
+        rule = {"dtype": "int" if pd.api.types.is_integer_dtype(series) else "float"}
+        if pd.api.types.is_numeric_dtype(series) and series.min() >= 0:
+            rule["ge"] = 0
+        if name == target and rule["dtype"] == "int" and series.nunique() <= 20:
+            rule["isin"] = sorted(int(v) for v in series.dropna().unique())
+        columns[name] = rule
+    return {"target": target, "columns": columns}
+
+
+def load_schema_config(config_path: str) -> dict:
+    """Loads per-dataset schema specs from a json config file
+
+    The file maps a UCI data id to a spec in the format of WINE_SCHEMA_SPEC, e.g.
+    `{"186": {"target": "quality", "columns": {"ph": {"dtype": "float", "le": 14}}}}`.
+
+    Args:
+        config_path (str): Path to the json config file
+
+    Returns:
+        dict: Mapping of data id (as a string) to its schema spec
+    """
+    with open(config_path) as f:
+        return json.load(f)
+
+
+def build_schema(spec: dict, checks: list = None) -> pa.DataFrameSchema:
+    """Builds the pandera schema for a schema spec
+
+    Args:
+        spec (dict): Schema spec, see WINE_SCHEMA_SPEC
+        checks (list, optional): Dataframe level checks. Defaults to None.
+
+    Returns:
+        pa.DataFrameSchema: The schema
+    """
+    columns = {}
+    for name, rule in spec["columns"].items():
+        column_checks = []
+        if "ge" in rule:
+            column_checks.append(Check.ge(rule["ge"]))
+        if "le" in rule:
+            column_checks.append(Check.le(rule["le"]))
+        if "isin" in rule:
+            column_checks.append(Check.isin(rule["isin"]))
+        columns[name] = Column(
+            pa.Int if rule.get("dtype") == "int" else pa.Float,
+            column_checks,
+            nullable=rule.get("nullable", False),
+        )
+    return pa.DataFrameSchema(columns, checks=checks)
+
+
+def validate_processed_data(
+    data: pd.DataFrame,
+    approximate: bool = False,
+    tolerance: float = 0.05,
+    schema_spec: dict = None,
+) -> bool:
     """Validate the processed data using a predefined schema.
 
+    In approximate mode the correlation checks are estimated from a row sample and the
+    duplicate check uses a vectorized row hash, and whether each verdict is certain or
+    only probable is printed.
+
     Args:
         data (pd.DataFrame): The processed data to be validated.
+        approximate (bool, optional): Use the approximate checks. Defaults to False.
+        tolerance (float, optional): Allowed probability of a wrong approximate verdict.
+            Defaults to 0.05.
+        schema_spec (dict, optional): Schema spec to validate against.
+            Defaults to WINE_SCHEMA_SPEC.
 
     Returns:
-        pd.DataFrame: The input DataFrame, if it passes validation.
-    """
-
-    schema = pa.DataFrameSchema(
-        {
-            "fixed_acidity": Column(pa.Float, Check.ge(0), nullable=False),
-            "volatile_acidity": Column(pa.Float, Check.ge(0), nullable=False),
-            "citric_acid": Column(pa.Float, Check.ge(0), nullable=False),
-            "residual_sugar": Column(pa.Float, Check.ge(0), nullable=False),
-            "chlorides": Column(pa.Float, Check.ge(0), nullable=False),
-            "free_sulfur_dioxide": Column(pa.Float, Check.ge(0), nullable=False),
-            "total_sulfur_dioxide": Column(pa.Float, Check.ge(0), nullable=False),
-            "density": Column(pa.Float, Check.ge(0), nullable=False),
-            "ph": Column(pa.Float, [Check.ge(0), Check.le(14)], nullable=False),
-            "sulphates": Column(pa.Float, Check.ge(0), nullable=False),
-            "alcohol": Column(pa.Float, Check.ge(0), nullable=False),
-            "quality": Column(
-                pa.Int, Check.isin([3, 4, 5, 6, 7, 8, 9]), nullable=False
-            ),  # Example: Replace with valid levels
-        },
+        bool: True if the data passed validation.
+    """
+    spec = schema_spec or WINE_SCHEMA_SPEC
+    target = spec["target"]
+    verdicts = {}
+
+    def no_duplicates(df):
+        if approximate:
+            return not has_duplicate_rows(df)
+        return ~df.duplicated().any()
+
+    def target_corr_ok(df):
+        if approximate:
+            passed, verdicts["target correlation"] = approx_corr_feats(
+                df, tolerance=tolerance, target=target
+            )
+            return passed
+        return (df.corr()[target].abs().drop(target) < 0.9).all()
+
+    def feature_corr_ok(df):
+        if approximate:
+            passed, verdicts["feature correlation"] = approx_corr_feats(
+                df, tolerance=tolerance
+            )
+            return passed
+        return check_corr_feats(df)
+
+    schema = build_schema(
+        spec,
         checks=[
             # Ensure no duplicate rows
-            pa.Check(lambda df: ~df.duplicated().any(), error="Duplicate rows found."),
+            pa.Check(no_duplicates, error="Duplicate rows found."),
             # Ensure no empty rows
             pa.Check(
                 lambda df: ~(df.isna().all(axis=1)).any(), error="Empty rows found."
@@ -98,20 +355,20 @@ def validate_processed_data(data: pd.DataFrame) -> pd.DataFrame:
             ),
             # Ensure the target variable distribution meets expectations
             pa.Check(
-                lambda df: df["quality"]
+                lambda df: df[target]
                 .value_counts(normalize=True)
-                .between(0.0001, 0.5)
+                .between(0.0001, spec.get("max_class_share", 1.0))
                 .all(),
                 error="Quality distribution is outside expected bounds.",
             ),
             # Check no anomalous correlations between target and features
             pa.Check(
-                lambda df: (df.corr()["quality"].abs()[:-1] < 0.9).all(),
+                target_corr_ok,
                 error="Anomalous correlations found between quality and features.",
             ),
             # Check no anomalous correlations between features
             pa.Check(
-                lambda df: check_corr_feats(df),
+                feature_corr_ok,
                 error="Anomalous correlations found between features.",
             ),
             # pa.Check(
@@ -121,14 +378,20 @@ def validate_processed_data(data: pd.DataFrame) -> pd.DataFrame:
         ],
     )
 
+    valid = True
     try:
         schema.validate(data)
         print("Data is valid!")
     except Exception as e:
         print(f"Validation error: {e}")
+        valid = False
+
+    for check_name, certain in verdicts.items():
+        print(f"Approximate {check_name} verdict is {'certain' if certain else 'probable'}")
+    return valid
 
 
-def split_data(data: pd.DataFrame):
+def split_data(data: pd.DataFrame, output_dir: str = None, random_state: int = 123):
     """Split the input DataFrame into training and testing sets.
 
     This function performs a stratified split of the input DataFrame:
@@ -138,20 +401,26 @@ def split_data(data: pd.DataFrame):
 
     Args:
         data (pd.DataFrame): Input DataFrame to be split.
+        output_dir (str, optional): Folder the csv files are written to.
+            Defaults to PROCESSED_FOLDER_PATH.
+        random_state (int, optional): Seed of the split. Defaults to 123.
 
     Returns:
         tuple: A tuple containing (train_df, test_df)
     """
+    output_dir = output_dir or PROCESSED_FOLDER_PATH
 
-    train_df, test_df = train_test_split(data, test_size=0.2, random_state=123)
+    train_df, test_df = train_test_split(data, test_size=0.2, random_state=random_state)
 
-    train_df.to_csv(os.path.join(PROCESSED_FOLDER_PATH, "wine_train.csv"), index=False)
-    test_df.to_csv(os.path.join(PROCESSED_FOLDER_PATH, "wine_test.csv"), index=False)
+    train_df.to_csv(os.path.join(output_dir, "wine_train.csv"), index=False)
+    test_df.to_csv(os.path.join(output_dir, "wine_test.csv"), index=False)
 
     return train_df, test_df
 
 
-def validate_data_distribution(train_df, test_df, report_path, threshold: int = 0.2):
+def validate_data_distribution(
+    train_df, test_df, report_path, threshold: int = 0.2, label: str = "quality"
+):
     """
     Validate the data distribution between the train and test sets.
 
@@ -160,11 +429,12 @@ def validate_data_distribution(train_df, test_df, report_path, threshold: int =
         test_df (pd.DataFrame): The testing data.
         report_path (str): The path to save the validation report.
         threshold (int, optional): The maximum allowed drift score. Defaults to 0.2.
+        label (str, optional): Name of the target column. Defaults to "quality".
     """
 
     full_path = f"{report_path}/validation_report.html"
-    train_ds = Dataset(train_df, label="quality", cat_features=[])
-    test_ds = Dataset(test_df, label="quality", cat_features=[])
+    train_ds = Dataset(train_df, label=label, cat_features=[])
+    test_ds = Dataset(test_df, label=label, cat_features=[])
     check = FeatureDrift()
     check_cond = check.add_condition_drift_score_less_than(
         max_allowed_numeric_score=threshold
@@ -182,6 +452,392 @@ def validate_data_distribution(train_df, test_df, report_path, threshold: int =
     result.save_as_html(full_path)
 
 
+def process_dataset(
+    raw_csv: str,
+    processed: str,
+    report_path: str,
+    schema_spec: dict = None,
+    approximate: bool = False,
+    tolerance: float = 0.05,
+    random_state: int = 123,
+) -> bool:
+    """Cleans, validates and splits one raw dataset and checks train/test drift
+
+    Args:
+        raw_csv (str): Path to the raw csv file
+        processed (str): Folder for the train and test csv files
+        report_path (str): Folder for the validation report
+        schema_spec (dict, optional): Schema spec, see WINE_SCHEMA_SPEC.
+            Defaults to WINE_SCHEMA_SPEC.
+        approximate (bool, optional): Use the approximate validation checks.
+            Defaults to False.
+        tolerance (float, optional): Allowed probability of a wrong approximate verdict.
+            Defaults to 0.05.
+        random_state (int, optional): Seed of the train/test split. Defaults to 123.
+
+    Returns:
+        bool: True if the data passed the schema validation
+    """
+    create_data_folder(processed)
+    create_data_folder(report_path)
+    spec = schema_spec or WINE_SCHEMA_SPEC
+
+    clean_df = clean_data(pd.read_csv(raw_csv))
+
+    valid = validate_processed_data(
+        clean_df, approximate=approximate, tolerance=tolerance, schema_spec=spec
+    )
+
+    train_df, test_df = split_data(
+        clean_df, output_dir=processed, random_state=random_state
+    )
+    validate_data_distribution(
+        train_df=train_df, test_df=test_df, report_path=report_path, label=spec["target"]
+    )
+    return valid
+
+
+def partition_stats(data: pd.DataFrame) -> dict:
+    """Computes the mergeable statistics the schema checks need for one partition
+
+    Besides counts, ranges and integer levels per column, the mean and the centered
+    cross-product matrix of the complete rows are kept, so correlations of several
+    partitions can be combined without reading their rows again.
+
+    Args:
+        data (pd.DataFrame): Cleaned numeric partition
+
+    Returns:
+        dict: Json serializable statistics, see merge_stats
+    """
+    values = data.to_numpy(dtype=np.float64)
+    nan = np.isnan(values)
+    complete = values[~nan.any(axis=1)]
+    mean = complete.mean(axis=0) if len(complete) else np.zeros(values.shape[1])
+    centered = complete - mean
+    with np.errstate(invalid="ignore"):
+        low = np.where(nan, np.inf, values).min(axis=0, initial=np.inf)
+        high = np.where(nan, -np.inf, values).max(axis=0, initial=-np.inf)
+    return {
+        "columns": list(data.columns),
+        "dtypes": [str(dtype) for dtype in data.dtypes],
+        "rows": len(data),
+        "empty_rows": int(nan.all(axis=1).sum()),
+        "missing": nan.sum(axis=0).tolist(),
+        "min": [None if np.isinf(v) else float(v) for v in low],
+        "max": [None if np.isinf(v) else float(v) for v in high],
+        "levels": {
+            column: {str(k): int(v) for k, v in data[column].value_counts().items()}
+            for column in data.columns
+            if pd.api.types.is_integer_dtype(data[column])
+        },
+        "complete": len(complete),
+        "mean": mean.tolist(),
+        "comoment": (centered.T @ centered).tolist(),
+    }
+
+
+def merge_stats(first: dict, second: dict) -> dict:
+    """Combines the statistics of two partitions as if they were computed on both
+
+    Means and cross-product matrices are merged with the pairwise update of Chan et
+    al., which stays accurate where summing raw sums and squares would not.
+
+    Args:
+        first (dict): Statistics from partition_stats or merge_stats
+        second (dict): Statistics of another partition with the same columns
+
+    Raises:
+        ValueError: When the partitions have different columns
+
+    Returns:
+        dict: The merged statistics
+    """
+    if first["columns"] != second["columns"]:
+        raise ValueError("Partition statistics have different columns")
+    n_a, n_b = first["complete"], second["complete"]
+    n = n_a + n_b
+    mean_a, mean_b = np.asarray(first["mean"]), np.asarray(second["mean"])
+    delta = mean_b - mean_a
+    mean = mean_a + delta * (n_b / n) if n else mean_a
+    comoment = np.asarray(first["comoment"]) + np.asarray(second["comoment"])
+    if n:
+        comoment += np.outer(delta, delta) * (n_a * n_b / n)
+
+    def pick(a, b, function):
+        # Columns without values in a partition have None as their bound
+        return [y if x is None else x if y is None else function(x, y) for x, y in zip(a, b)]
+
+    levels = {}
+    for column in set(first["levels"]) | set(second["levels"]):
+        counts = dict(first["levels"].get(column, {}))
+        for level, count in second["levels"].get(column, {}).items():
+            counts[level] = counts.get(level, 0) + count
+        levels[column] = counts
+    return {
+        "columns": first["columns"],
+        "dtypes": first["dtypes"],
+        "rows": first["rows"] + second["rows"],
+        "empty_rows": first["empty_rows"] + second["empty_rows"],
+        "missing": (np.asarray(first["missing"]) + second["missing"]).tolist(),
+        "min": pick(first["min"], second["min"], min),
+        "max": pick(first["max"], second["max"], max),
+        "levels": levels,
+        "complete": n,
+        "mean": mean.tolist(),
+        "comoment": comoment.tolist(),
+    }
+
+
+def validate_stats(stats: dict, schema_spec: dict = None) -> bool:
+    """Runs the checks of validate_processed_data on merged partition statistics
+
+    Duplicates are not checked because the raw store never holds a row twice.
+
+    Args:
+        stats (dict): Statistics from merge_stats
+        schema_spec (dict, optional): Schema spec to validate against.
+            Defaults to WINE_SCHEMA_SPEC.
+
+    Returns:
+        bool: True if the data passed validation.
+    """
+    spec = schema_spec or WINE_SCHEMA_SPEC
+    target = spec["target"]
+    position = {column: i for i, column in enumerate(stats["columns"])}
+    errors = []
+
+    for name, rule in spec["columns"].items():
+        if name not in position:
+            errors.append(f"Column '{name}' is missing.")
+            continue
+        i = position[name]
+        kind = "int" if rule.get("dtype") == "int" else "float"
+        if not stats["dtypes"][i].startswith(kind):
+            errors.append(f"Column '{name}' is {stats['dtypes'][i]}, expected {kind}.")
+        if stats["missing"][i] and not rule.get("nullable", False):
+            errors.append(f"Column '{name}' has missing values.")
+        low, high = stats["min"][i], stats["max"][i]
+        if "ge" in rule and low is not None and low < rule["ge"]:
+            errors.append(f"Column '{name}' has values below {rule['ge']}.")
+        if "le" in rule and high is not None and high > rule["le"]:
+            errors.append(f"Column '{name}' has values above {rule['le']}.")
+        if "isin" in rule:
+            allowed = {str(v) for v in rule["isin"]}
+            if not set(stats["levels"].get(name, {})) <= allowed:
+                errors.append(f"Column '{name}' has values outside {rule['isin']}.")
+
+    if stats["empty_rows"]:
+        errors.append("Empty rows found.")
+    if stats["rows"] and (np.asarray(stats["missing"]) / stats["rows"] >= 0.05).any():
+        errors.append("Missingness exceeds threshold.")
+
+    counts = np.asarray(list(stats["levels"].get(target, {}).values()), dtype=np.float64)
+    shares = counts / counts.sum() if counts.sum() else counts
+    if ((shares < 0.0001) | (shares > spec.get("max_class_share", 1.0))).any():
+        errors.append("Quality distribution is outside expected bounds.")
+
+    comoment = np.asarray(stats["comoment"])
+    scale = np.sqrt(np.diag(comoment))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = np.abs(comoment / np.outer(scale, scale))
+    np.fill_diagonal(corr, 0)
+    if target in position and (corr[position[target]] >= 0.9).any():
+        errors.append("Anomalous correlations found between quality and features.")
+    if (corr >= 0.9).any():
+        errors.append("Anomalous correlations found between features.")
+
+    if errors:
+        print(f"Validation error: {errors}")
+        return False
+    print("Data is valid!")
+    return True
+
+
+def process_store(
+    store_path: str,
+    processed: str,
+    report_path: str,
+    schema_spec: dict = None,
+    test_share: float = 0.2,
+    random_state: int = 123,
+) -> bool:
+    """Validates and splits only the raw store partitions added since the last run
+
+    Statistics of partitions seen before are read from the cache next to the processed
+    data and merged with those of the new partitions for the schema checks. New rows are
+    split by a seeded hash of their values (see `hashing.hash_split`), checked for
+    train/test drift and then appended to the train and test csv files.
+
+    The cache is replaced only after the rows were appended, together with the sizes of
+    the csv files. A run that fails before that leaves the cache as it was, and the next
+    run cuts the csv files back to the recorded sizes before appending, so retried
+    partitions are never appended twice.
+
+    Args:
+        store_path (str): Folder of the raw store
+        processed (str): Folder for the train and test csv files and the cache
+        report_path (str): Folder for the validation report
+        schema_spec (dict, optional): Schema spec, see WINE_SCHEMA_SPEC.
+            Defaults to WINE_SCHEMA_SPEC.
+        test_share (float, optional): Share of rows in the test set. Defaults to 0.2.
+        random_state (int, optional): Seed of the hash split. Defaults to 123.
+
+    Returns:
+        bool: True if all stored data passed the schema validation
+    """
+    create_data_folder(processed)
+    create_data_folder(report_path)
+    spec = schema_spec or WINE_SCHEMA_SPEC
+    store = RawStore(store_path)
+
+    stats_path = os.path.join(processed, STORE_STATS_FILE_NAME)
+    cache = {"partitions": {}}
+    if os.path.exists(stats_path):
+        with open(stats_path) as f:
+            cache = json.load(f)
+    new = [name for name in store.partitions if name not in cache["partitions"]]
+    print(f"{len(new)} new partitions, {len(store.partitions) - len(new)} from cache")
+    if not store.partitions:
+        return True
+
+    splits = []
+    for name in new:
+        clean_df = clean_data(store.read([name]))
+        cache["partitions"][name] = partition_stats(clean_df)
+        is_test = hash_split(clean_df, test_share=test_share, seed=random_state)
+        splits.append((clean_df[~is_test], clean_df[is_test]))
+
+    stats = reduce(merge_stats, (cache["partitions"][name] for name in store.partitions))
+    valid = validate_stats(stats, spec)
+    if not new:
+        return valid
+
+    train_new = pd.concat([train for train, _ in splits])
+    test_new = pd.concat([test for _, test in splits])
+    if len(train_new) and len(test_new):
+        validate_data_distribution(
+            train_df=train_new,
+            test_df=test_new,
+            report_path=report_path,
+            label=spec["target"],
+        )
+
+    # The first run replaces split files that were not written from the store
+    mode = "a" if len(new) < len(store.partitions) else "w"
+    sizes = cache.setdefault("sizes", {})
+    for data, file_name in ((train_new, "wine_train.csv"), (test_new, "wine_test.csv")):
+        path = os.path.join(processed, file_name)
+        if mode == "a" and file_name in sizes:
+            # Drop rows a failed run appended after the last completed one
+            os.truncate(path, sizes[file_name])
+        data.to_csv(path, mode=mode, header=mode == "w", index=False)
+        sizes[file_name] = os.path.getsize(path)
+
+    with open(f"{stats_path}.tmp", "w") as f:
+        json.dump(cache, f)
+    os.replace(f"{stats_path}.tmp", stats_path)
+    return valid
+
+
+def _process_batch_dataset(
+    data_id: int,
+    raw: str,
+    processed: str,
+    report_path: str,
+    spec: dict,
+    approximate: bool,
+    tolerance: float,
+    random_state: int,
+) -> bool:
+    """Processes one dataset of `run_batch` in a worker process, see run_batch"""
+    raw_csv = os.path.join(raw, str(data_id), BATCH_FILE_NAME)
+    if spec is None:
+        clean_df = clean_data(pd.read_csv(raw_csv))
+        spec = infer_schema_spec(clean_df, target=clean_df.columns[-1])
+    return process_dataset(
+        raw_csv,
+        os.path.join(processed, str(data_id)),
+        os.path.join(report_path, str(data_id)),
+        schema_spec=spec,
+        approximate=approximate,
+        tolerance=tolerance,
+        random_state=random_state,
+    )
+
+
+def run_batch(
+    raw: str,
+    processed: str,
+    report_path: str,
+    data_ids: list,
+    schema_config: str = None,
+    max_workers: int = None,
+    approximate: bool = False,
+    tolerance: float = 0.05,
+    random_state: int = 123,
+) -> dict:
+    """Processes several datasets downloaded with `data_download.py --data_ids` in parallel
+
+    Every dataset is read from `<raw>/<data_id>/combined.csv` and its outputs are
+    written to `<processed>/<data_id>` and `<report_path>/<data_id>`. Datasets without
+    an entry in the schema config get a schema inferred from their cleaned data, using
+    the last column as the target. The checks are CPU bound, so every dataset is
+    processed in its own worker process.
+
+    Args:
+        raw (str): Parent folder of the raw per-dataset folders
+        processed (str): Parent folder for the processed per-dataset folders
+        report_path (str): Parent folder for the per-dataset validation reports
+        data_ids (list): Data ids to process
+        schema_config (str, optional): Path to a json schema config. Defaults to None.
+        max_workers (int, optional): Number of worker processes. Defaults to the limit
+            of the validation_batch stage in resources.py.
+        approximate (bool, optional): Use the approximate validation checks.
+            Defaults to False.
+        tolerance (float, optional): Allowed probability of a wrong approximate verdict.
+            Defaults to 0.05.
+        random_state (int, optional): Seed of every train/test split. Defaults to 123.
+
+    Raises:
+        RuntimeError: When one or more of the datasets failed to process
+
+    Returns:
+        dict: Mapping of data id to whether it passed the schema validation
+    """
+    specs = load_schema_config(schema_config) if schema_config else {}
+    specs.setdefault("186", WINE_SCHEMA_SPEC)
+
+    results, failed = {}, {}
+    n_jobs, threads = stage_limits("validation_batch")
+    with ProcessPoolExecutor(
+        max_workers=max_workers or n_jobs, initializer=threadpool_limits, initargs=(threads,)
+    ) as executor:
+        futures = {
+            data_id: executor.submit(
+                _process_batch_dataset,
+                data_id,
+                raw,
+                processed,
+                report_path,
+                specs.get(str(data_id)),
+                approximate,
+                tolerance,
+                random_state,
+            )
+            for data_id in data_ids
+        }
+        for data_id, future in futures.items():
+            try:
+                results[data_id] = future.result()
+            except Exception as e:
+                failed[data_id] = e
+
+    if failed:
+        raise RuntimeError(f"Failed to process datasets: {failed}")
+    return results
+
+
 @click.command()
 @click.option(
     "--raw",
@@ -198,7 +854,59 @@ def validate_data_distribution(train_df, test_df, report_path, threshold: int =
     type=str,
     help="Report path for storing the validation report",
 )
-def main(raw: str, processed: str, report_path: str):
+@click.option(
+    "--approximate",
+    is_flag=True,
+    help="Use sampled correlation and hashed duplicate checks for large data",
+)
+@click.option(
+    "--tolerance",
+    type=float,
+    default=0.05,
+    help="Allowed probability of a wrong verdict in approximate mode",
+)
+@click.option(
+    "--data_ids",
+    type=str,
+    default=None,
+    help="Comma separated IDs of datasets downloaded in batch mode",
+)
+@click.option(
+    "--schema_config",
+    type=str,
+    default=None,
+    help="Json file with a validation schema per dataset id",
+)
+@click.option(
+    "--max_workers",
+    type=int,
+    default=None,
+    help="Worker processes in batch mode, defaults to the CPU budget",
+)
+@click.option(
+    "--seed",
+    type=int,
+    default=None,
+    help="Root seed the split seed is derived from, the default keeps seed 123",
+)
+@click.option(
+    "--store_path",
+    type=str,
+    default=None,
+    help="Raw store folder, only its new partitions are validated and split",
+)
+def main(
+    raw: str,
+    processed: str,
+    report_path: str,
+    approximate: bool = False,
+    tolerance: float = 0.05,
+    data_ids: str = None,
+    schema_config: str = None,
+    max_workers: int = None,
+    seed: int = None,
+    store_path: str = None,
+):
     """
     Main data processing pipeline for wine quality dataset.
 
@@ -208,25 +916,46 @@ def main(raw: str, processed: str, report_path: str):
         raw (str): Path to raw data directory
         processed (str): Path to processed data directory
         report_path (str): Path for storing validation reports
+        approximate (bool): Use the approximate validation checks
+        tolerance (float): Allowed probability of a wrong approximate verdict
+        data_ids (str): Comma separated data ids to process in parallel batch mode
+        schema_config (str): Json file with a validation schema per data id
+        max_workers (int): Number of worker processes in batch mode
+        seed (int): Root seed of the pipeline, None for the historical split seed
+        store_path (str): Raw store folder to process incrementally instead of raw
     """
-    print(f"This is a {raw} data path")
-    raw_data_data = f"{raw}/wine_quality_combined.csv"
-    create_data_folder(processed)
-    create_data_folder(report_path)
-
-    wine_df = pd.read_csv(raw_data_data)
-
-    clean_wine = clean_data(wine_df)
-
-    validate_processed_data(clean_wine)
-
-    train_df, test_df = split_data(
-        clean_wine,
-    )
-    validate_data_distribution(
-        train_df=train_df, test_df=test_df, report_path=report_path
-    )
+    random_state = stage_seed("split", seed)
+    if store_path:
+        with stage_resources("validation", log_path=RESOURCE_LOG_PATH):
+            process_store(store_path, processed, report_path, random_state=random_state)
+        return
+
+    if data_ids:
+        ids = [int(i) for i in data_ids.split(",") if i.strip()]
+        with stage_resources("validation_batch", log_path=RESOURCE_LOG_PATH):
+            run_batch(
+                raw,
+                processed,
+                report_path,
+                ids,
+                schema_config=schema_config,
+                max_workers=max_workers,
+                approximate=approximate,
+                tolerance=tolerance,
+                random_state=random_state,
+            )
+        return
 
+    print(f"This is a {raw} data path")
+    with stage_resources("validation", log_path=RESOURCE_LOG_PATH):
+        process_dataset(
+            f"{raw}/wine_quality_combined.csv",
+            processed,
+            report_path,
+            approximate=approximate,
+            tolerance=tolerance,
+            random_state=random_state,
+        )
 
 if __name__ == "__main__":
     main()
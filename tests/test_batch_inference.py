@@ -0,0 +1,72 @@
+import os
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.tree import DecisionTreeClassifier
+from src.batch_inference import predict_array, score_files
+from src.row_validation import RowValidator, REJECTED_LABEL
+
+
+@pytest.fixture
+def data():
+    """Fixture for random wine-like data."""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(400, 3)), columns=["alcohol", "ph", "density"])
+    df["quality"] = np.where(df["alcohol"] + df["ph"] > 0, 6, 5)
+    return df
+
+
+@pytest.fixture
+def model(data):
+    """Fixture for a fitted decision tree."""
+    return DecisionTreeClassifier(random_state=0).fit(data.drop(columns="quality"), data["quality"])
+
+
+def test_predict_array(data, model):
+    """Test that parallel chunked prediction matches model.predict."""
+    X = data.drop(columns="quality")[["density", "ph", "alcohol"]]
+
+    predictions = predict_array(X, model, n_workers=2, chunk_rows=64)
+
+    assert np.array_equal(predictions, model.predict(X[model.feature_names_in_]))
+
+
+def test_score_files(data, model, tmp_path):
+    """Test that shards are scored and returned in input order."""
+    model_path = tmp_path / "model.pkl"
+    joblib.dump(model, model_path)
+    paths = []
+    for i in range(4):
+        path = tmp_path / f"shard{i}.csv"
+        data.iloc[i * 100:(i + 1) * 100].to_csv(path, index=False)
+        paths.append(str(path))
+
+    results = list(score_files(paths, str(tmp_path / "out"), str(model_path), n_workers=2))
+
+    assert [r[0] for r in results] == paths
+    assert [r[2] for r in results] == [100] * 4
+    predictions = pd.read_csv(results[2][1])["prediction"].to_numpy()
+    assert np.array_equal(predictions, model.predict(data.iloc[200:300].drop(columns="quality")))
+
+
+def test_score_files_rejects_rows(data, model, tmp_path):
+    """Test that rows failing the stored validator are flagged and written out."""
+    model_path = tmp_path / "model.pkl"
+    joblib.dump(model, model_path)
+    spec = {"columns": {"ph": {"ge": -10, "le": 10}}}
+    RowValidator.from_training(data.drop(columns="quality"), spec).save(str(tmp_path))
+    shard = data.iloc[:10].copy()
+    shard.loc[3, "ph"] = 99.0
+    shard.to_csv(tmp_path / "shard.csv", index=False)
+
+    [(_, output_path, n_rows, n_rejected)] = score_files(
+        [str(tmp_path / "shard.csv")], str(tmp_path / "out"), str(model_path), n_workers=1
+    )
+
+    predictions = pd.read_csv(output_path)["prediction"].to_numpy()
+    expected = model.predict(shard.drop(columns="quality"))
+    expected[3] = REJECTED_LABEL
+    assert (n_rows, n_rejected) == (10, 1)
+    assert np.array_equal(predictions, expected)
+    assert os.path.exists(tmp_path / "out" / "shard_rejected.csv")
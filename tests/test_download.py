@@ -7,7 +7,14 @@ import pandas as pd
 from unittest import mock
 
 # Import the function to test
-from src.data_download import create_data_folder, download_data
+from src.data_download import (
+    create_data_folder,
+    download_data,
+    download_many,
+    main,
+    BATCH_FILE_NAME,
+)
+from src.raw_store import RawStore
 
 
 def test_create_data_folder():
@@ -89,4 +96,39 @@ def test_download_data_invalid_id():
         ValueError
     ):  # Assuming fetch_ucirepo will raise a ValueError for invalid id
         download_data(file_path, data_id=invalid_data_id)
- 
\ No newline at end of file
+ 
+
+def test_download_many(tmp_path):
+    """
+    Test that download_many writes one folder per dataset and reports failures.
+    """
+    def fake_download(file_path, data_id=186):
+        if data_id == 999:
+            raise ValueError("unknown id")
+        pd.DataFrame({"a": [data_id]}).to_csv(file_path, index=False)
+
+    with patch("src.data_download.download_data", side_effect=fake_download):
+        paths = download_many([186, 109], str(tmp_path), max_workers=2)
+
+        assert paths[186] == os.path.join(str(tmp_path), "186", BATCH_FILE_NAME)
+        assert pd.read_csv(paths[109])["a"].tolist() == [109]
+
+        with pytest.raises(RuntimeError):
+            download_many([186, 999], str(tmp_path))
+
+
+def test_main_store_mode_skips_csv(tmp_path):
+    """
+    Test that store mode ingests the fetched rows without writing the full csv.
+    """
+    frame = pd.DataFrame({"feature1": [1, 2], "target": [0, 1]})
+    store_path = tmp_path / "store"
+
+    with patch("src.data_download.fetch_data", return_value=frame):
+        main.main(
+            [f"--folder_path={tmp_path / 'raw'}", "--data_id=186", f"--store_path={store_path}"],
+            standalone_mode=False,
+        )
+
+    assert not (tmp_path / "raw").exists()
+    assert len(RawStore(str(store_path)).read()) == 2
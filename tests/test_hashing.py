@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from src.hashing import hash_rows, find_duplicate_rows, hash_split
+
+
+def test_hash_rows():
+    """Test that equal rows hash equally and distinct rows do not."""
+    data = pd.DataFrame({"a": [1.0, 1.0, 2.0, 0.0, np.nan], "b": [3.0, 3.0, 3.0, -0.0, np.nan]})
+
+    hashes = hash_rows(data)
+
+    assert hashes.dtype == np.uint64
+    assert hashes[0] == hashes[1]
+    assert hashes[0] != hashes[2]
+    assert hashes[3] == hash_rows(np.array([[0.0, 0.0]]))[0]
+
+
+def test_find_duplicate_rows():
+    """Test that find_duplicate_rows matches DataFrame.duplicated on random data."""
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(rng.integers(0, 3, size=(500, 3)).astype(float))
+
+    mask = find_duplicate_rows(data)
+
+    assert (mask == data.duplicated().to_numpy()).all()
+
+
+def test_hash_split():
+    """Test that rows keep their split as data grows and the share is respected."""
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(rng.random((10_000, 3)))
+
+    mask = hash_split(data, test_share=0.2, seed=1)
+
+    assert abs(mask.mean() - 0.2) < 0.02
+    assert (hash_split(data.iloc[:500], test_share=0.2, seed=1) == mask[:500]).all()
+    assert not (hash_split(data, test_share=0.2, seed=2) == mask).all()
@@ -0,0 +1,175 @@
+import os
+import time
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.tree import DecisionTreeClassifier
+from src.inference import PredictionCache, ModelHolder
+from src.row_validation import RowValidator, REJECTED_LABEL
+
+
+@pytest.fixture
+def train_data():
+    """Fixture for sample training data."""
+    return pd.DataFrame({
+        "feature1": [7.4, 7.8, 7.9, 7.2, 7.3, 7.6],
+        "feature2": [0.7, 0.88, 0.76, 0.65, 0.62, 0.69],
+        "quality": [5, 6, 5, 6, 5, 6],
+    })
+
+
+@pytest.fixture
+def model_file(train_data, tmp_path):
+    """Fixture that saves a fitted model and returns its path."""
+    model = DecisionTreeClassifier(random_state=0)
+    model.fit(train_data.drop(columns="quality"), train_data["quality"])
+    path = tmp_path / "model.pkl"
+    joblib.dump(model, path)
+    return str(path)
+
+
+def test_prediction_cache_hits(train_data, model_file):
+    """Test that repeated and near-identical rows are served from the cache."""
+    X = train_data.drop(columns="quality")
+    cache = PredictionCache(model_file, precision={"feature1": 1, "feature2": 2})
+
+    first = cache.predict(X)
+    second = cache.predict(X + 0.001)
+
+    assert np.array_equal(first, train_data["quality"].to_numpy())
+    assert np.array_equal(first, second)
+    assert cache.stats()["hits"] == len(X)
+    assert cache.hit_rate == 0.5
+    assert cache.predict_one(X.iloc[0]) == first[0]
+
+
+def test_prediction_cache_eviction_and_invalidation(train_data, model_file):
+    """Test LRU and TTL eviction and invalidation when the model file changes."""
+    X = train_data.drop(columns="quality")
+    cache = PredictionCache(model_file, maxsize=3, ttl=0.05)
+
+    cache.predict(X)
+    assert cache.stats()["size"] == 3 and cache.stats()["evictions"] == 3
+
+    time.sleep(0.1)
+    cache.predict(X.iloc[-1:])
+    assert cache.hits == 0
+
+    joblib.dump(DecisionTreeClassifier().fit(X, [5] * len(X)), model_file)
+    os.utime(model_file, ns=(0, 0))
+    assert list(cache.predict(X)) == [5] * len(X)
+    assert cache.stats()["invalidations"] == 1
+
+
+@pytest.fixture
+def canary_file(train_data, tmp_path):
+    """Fixture that saves the labelled canary rows and returns their path."""
+    path = tmp_path / "canary.csv"
+    train_data.to_csv(path, index=False)
+    return str(path)
+
+
+def replace_model(model, path):
+    """Writes a model the way train_model does, through a rename."""
+    joblib.dump(model, f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+
+
+def test_model_holder_swap_and_reject(train_data, model_file, canary_file):
+    """Test that a passing model is swapped in and failing ones are rejected."""
+    X, y = train_data.drop(columns="quality"), train_data["quality"]
+    holder = ModelHolder(model_file, canary_path=canary_file, on_event=None)
+    assert holder.check() is False
+    assert np.array_equal(holder.predict(X), y.to_numpy())
+
+    # A constant model loses half the canary accuracy and is rejected
+    replace_model(DecisionTreeClassifier().fit(X, [5] * len(X)), model_file)
+    assert holder.check() is False
+    with open(model_file, "wb") as f:
+        f.write(b"not a pickle")
+    assert holder.check() is False
+    assert holder.rejections == 2
+    assert np.array_equal(holder.predict(X), y.to_numpy())
+
+    replace_model(DecisionTreeClassifier(max_depth=3, random_state=1).fit(X, y), model_file)
+    assert holder.check() is True
+    metrics = holder.metrics()
+    assert metrics["swaps"] == 1 and metrics["canary_accuracy"] == 1.0
+    assert metrics["load_seconds"] > 0 and metrics["warmup_seconds"] > 0
+    assert [e["event"] for e in holder.events] == ["load", "rejected", "rejected", "swap"]
+
+
+def test_model_holder_watcher(train_data, model_file, canary_file):
+    """Test that the watcher swaps models while predictions keep being served."""
+    X, y = train_data.drop(columns="quality"), train_data["quality"]
+    holder = ModelHolder(model_file, canary_path=canary_file, poll_interval=0.01, on_event=None)
+    holder.start()
+    try:
+        replace_model(DecisionTreeClassifier(random_state=2).fit(X, y), model_file)
+        deadline = time.monotonic() + 5
+        while holder.swaps == 0 and time.monotonic() < deadline:
+            assert np.array_equal(holder.predict(X), y.to_numpy())
+    finally:
+        holder.stop()
+    assert holder.swaps == 1
+    assert holder.predictions >= len(X)
+
+
+def test_model_holder_watcher_survives_missing_file(train_data, model_file, canary_file, monkeypatch):
+    """Test that the watcher keeps polling when the model file disappears mid-poll."""
+    from src import inference
+    X, y = train_data.drop(columns="quality"), train_data["quality"]
+    holder = ModelHolder(model_file, canary_path=canary_file, poll_interval=0.01, on_event=None)
+    real_load, real_version = inference.load_model, inference._file_version
+    calls = []
+
+    def load_while_renamed(path):
+        # The file is moved away between the change check and the load
+        os.rename(path, f"{path}.moved")
+        calls.append(path)
+        return real_load(path)
+
+    def flaky_version(path):
+        if len(calls) == 1:
+            calls.append("error")
+            raise PermissionError("model file is locked")
+        return real_version(path)
+
+    monkeypatch.setattr("src.inference.load_model", load_while_renamed)
+    monkeypatch.setattr("src.inference._file_version", flaky_version)
+    holder.start()
+    try:
+        replace_model(DecisionTreeClassifier(random_state=2).fit(X, y), model_file)
+        deadline = time.monotonic() + 5
+        while holder.watch_errors == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        monkeypatch.setattr("src.inference.load_model", real_load)
+        os.rename(f"{model_file}.moved", model_file)
+        while holder.swaps == 0 and time.monotonic() < deadline:
+            assert np.array_equal(holder.predict(X), y.to_numpy())
+    finally:
+        holder.stop()
+    assert holder.watch_errors == 1 and holder.swaps == 1
+    assert [e["event"] for e in holder.events] == ["load", "error", "swap"]
+
+
+def test_out_of_range_rows_are_rejected(train_data, model_file, canary_file):
+    """Test that rows failing the stored validator are flagged and never scored."""
+    X = train_data.drop(columns="quality")
+    spec = {"columns": {"feature1": {"ge": 0}, "feature2": {"ge": 0, "le": 1}}}
+    RowValidator.from_training(X, schema_spec=spec).save(os.path.dirname(model_file))
+    batch = X.iloc[:3].copy()
+    batch.loc[1, "feature2"] = 5.0
+    batch.loc[2, "feature1"] = np.nan
+    expected = [train_data["quality"].iloc[0], REJECTED_LABEL, REJECTED_LABEL]
+
+    holder = ModelHolder(model_file, canary_path=canary_file, on_event=None)
+    predictions, rejected = holder.predict(batch, return_rejected=True)
+    cache = PredictionCache(model_file)
+
+    assert list(predictions) == expected
+    assert list(rejected["reason"]) == ["out of range feature2", "missing or non-numeric feature1"]
+    assert holder.metrics()["rejected_rows"] == 2 and holder.predictions == 1
+    assert list(cache.predict(batch)) == expected
+    assert cache.stats()["rejected_rows"] == 2 and cache.misses == 1
@@ -0,0 +1,59 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.tree import DecisionTreeClassifier
+from src.load_test import sample_rows, load_test
+
+
+@pytest.fixture
+def paths(tmp_path):
+    """Fixture for a labelled csv file and a model fitted on it."""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(300, 3)), columns=["alcohol", "ph", "density"])
+    df["quality"] = np.where(df["alcohol"] + df["ph"] > 0, 6, 5)
+    data_path = tmp_path / "test.csv"
+    df.to_csv(data_path, index=False)
+    model = DecisionTreeClassifier(random_state=0).fit(df.drop(columns="quality"), df["quality"])
+    model_path = tmp_path / "model.pkl"
+    joblib.dump(model, model_path)
+    return str(data_path), str(model_path), df
+
+
+def test_sample_rows(paths):
+    """Test that sampled rows are reproducible and synthetic rows keep the schema and ranges."""
+    data_path, _, _ = paths
+    features = pd.read_csv(data_path).drop(columns="quality")
+
+    rows = sample_rows(50, data_path, random_state=1)
+    synthetic = sample_rows(500, data_path, synthetic=True, random_state=1)
+
+    assert rows.equals(sample_rows(50, data_path, random_state=1))
+    assert set(rows.itertuples(index=False)) <= set(features.itertuples(index=False))
+    assert list(synthetic.columns) == list(features.columns)
+    assert (synthetic.min() >= features.min()).all() and (synthetic.max() <= features.max()).all()
+
+
+def test_load_test(paths, tmp_path):
+    """Test that direct and HTTP runs are measured and the hottest run is profiled."""
+    data_path, model_path, _ = paths
+    output_dir = tmp_path / "load_test"
+
+    results_df = load_test(
+        ["direct", "http"],
+        model_path=model_path,
+        data_path=data_path,
+        n_requests=20,
+        batch_rows=5,
+        concurrency=2,
+        rate=200.0,
+        output_dir=str(output_dir),
+    )
+
+    assert list(results_df["mode"]) == ["direct", "http"]
+    assert (results_df["errors"] == 0).all() and (results_df["requests"] == 20).all()
+    assert (results_df["p50_ms"] <= results_df["p99_ms"]).all()
+    assert (results_df["process_peak_rss_mb"] >= results_df["process_rss_mb"]).all()
+    assert (results_df["child_peak_rss_mb"] == 0).all()
+    assert (output_dir / "results.csv").exists()
+    assert len(list(output_dir.glob("*.prof"))) == 1
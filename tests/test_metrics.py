@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import classification_report, confusion_matrix
+
+from src.metrics import ConfusionAccumulator
+
+
+@pytest.fixture
+def labels():
+    rng = np.random.default_rng(0)
+    y_true = rng.integers(3, 9, size=500)
+    y_pred = np.where(rng.random(500) < 0.6, y_true, rng.integers(4, 8, size=500))
+    return y_true, y_pred
+
+
+def test_report_matches_sklearn(labels):
+    """Test that the report and counts match the sklearn metrics."""
+    y_true, y_pred = labels
+    confusion = ConfusionAccumulator().update(y_true, y_pred)
+    expected = pd.DataFrame(
+        classification_report(y_true, y_pred, output_dict=True, zero_division=0)
+    ).transpose()
+
+    report_df = confusion.report()
+    assert list(report_df.index) == list(expected.index)
+    assert np.allclose(report_df.to_numpy(), expected[report_df.columns].to_numpy())
+    assert (confusion.counts == confusion_matrix(y_true, y_pred)).all()
+
+
+def test_merge_equals_single_pass(labels):
+    """Test that merging chunk accumulators gives the counts of a single pass."""
+    y_true, y_pred = labels
+    full = ConfusionAccumulator().update(y_true, y_pred)
+
+    # The first chunk misses some labels, so merging must grow the matrix
+    first = ConfusionAccumulator().update(y_true[:10], y_pred[:10])
+    second = ConfusionAccumulator().update(y_true[10:], y_pred[10:])
+    merged = first.merge(second)
+
+    assert (merged.labels == full.labels).all()
+    assert (merged.counts == full.counts).all()
+    assert merged.total == len(y_true)
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.monitoring import DriftMonitor
+
+
+@pytest.fixture
+def train_data():
+    """Fixture for sample training data."""
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "alcohol": rng.normal(10, 1, size=5000),
+        "ph": rng.normal(3.2, 0.15, size=5000),
+        "quality": rng.integers(3, 9, size=5000),
+    })
+
+
+def test_no_alerts_without_drift(train_data):
+    """Test that data from the training distribution raises no alerts."""
+    alerts = []
+    monitor = DriftMonitor.from_reference(train_data, window_size=1000, on_alert=alerts.append)
+
+    returned = monitor.update(train_data.sample(2500, random_state=1))
+
+    assert monitor.windows_done == 2
+    assert monitor.rows == 500
+    assert returned == alerts == []
+    assert set(monitor.drift_scores()) == {"alcohol", "ph"}
+
+
+def test_alerts_on_drift_and_missing(train_data):
+    """Test drift and missing value alerts and the window quantiles."""
+    alerts = []
+    monitor = DriftMonitor.from_reference(train_data, window_size=1000, on_alert=alerts.append)
+    stream = train_data.sample(1000, random_state=1).assign(alcohol=lambda df: df["alcohol"] + 1)
+    stream.loc[stream.index[:100], "ph"] = np.nan
+
+    monitor.update(stream.iloc[:400])
+    assert abs(monitor.quantile("alcohol", 0.5) - 11) < 0.2
+    monitor.update(stream.iloc[400:])
+
+    assert {(a["check"], a["feature"]) for a in alerts} == {("drift", "alcohol"), ("missing", "ph")}
+    assert [a["value"] for a in alerts if a["check"] == "drift"][0] >= 0.2
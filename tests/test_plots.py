@@ -116,6 +116,7 @@ def test_main(monkeypatch, train_data, test_data, feature_importances, tmp_path)
     monkeypatch.setattr("src.plots.TRAIN_DATA_PATH", str(train_data_path))
     monkeypatch.setattr("src.plots.TEST_DATA_PATH", str(test_data_path))
     monkeypatch.setattr("src.plots.FEATURES_PATH", str(features_path))
+    monkeypatch.setattr("src.plots.RESOURCE_LOG_PATH", str(tmp_path / "usage.jsonl"))
 
     # Call main function
     from src.plots import main
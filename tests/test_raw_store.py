@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.raw_store import RawStore
+
+
+@pytest.fixture
+def batch():
+    """Fixture for a raw batch with repeated rows."""
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(rng.integers(0, 4, size=(200, 3)).astype(float), columns=["a", "b", "c"])
+    data["quality"] = rng.integers(3, 9, size=200)
+    return data
+
+
+def test_ingest_deduplicates(batch, tmp_path):
+    """Test that rows are stored once across batches and read back unchanged."""
+    store = RawStore(str(tmp_path))
+    first = store.ingest(batch.iloc[:100])
+    second = store.ingest(batch)
+    again = store.ingest(batch[["quality", "c", "b", "a"]])
+
+    expected = batch.drop_duplicates()
+    assert first["rows"] == len(batch.iloc[:100].drop_duplicates())
+    assert first["rows"] + second["rows"] == len(expected)
+    assert again == {"partition": None, "rows": 0, "duplicates": len(batch)}
+
+    stored = RawStore(str(tmp_path)).read()
+    assert stored.dtypes.equals(batch.dtypes)
+    key = list(batch.columns)
+    pd.testing.assert_frame_equal(
+        stored.sort_values(key).reset_index(drop=True),
+        expected.sort_values(key).reset_index(drop=True),
+    )
+
+
+def test_missing_segment_is_rebuilt(batch, tmp_path):
+    """Test that a lost index segment is rebuilt and still deduplicates."""
+    store = RawStore(str(tmp_path))
+    name = store.ingest(batch)["partition"]
+    os.remove(tmp_path / f"{name}.rows.npy")
+
+    assert RawStore(str(tmp_path)).ingest(batch)["rows"] == 0
+    with pytest.raises(ValueError):
+        store.ingest(batch.drop(columns="a"))
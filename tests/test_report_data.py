@@ -0,0 +1,39 @@
+import os
+import json
+import pandas as pd
+from sklearn.tree import DecisionTreeClassifier
+from src.report_data import REPORT_DATA_VERSION, build_report_data, write_report_data
+
+
+def test_build_report_data():
+    """Test that the bundle holds the metrics, tables and histograms of the report."""
+    train_df = pd.DataFrame({
+        "feature1": [7.4, 7.8, 7.9, 7.2, 7.3, 7.4],
+        "feature2": [0.7, 0.88, 0.76, 0.65, 0.62, 0.7],
+        "quality": [5, 6, 5, 6, 5, 5],
+    })
+    test_df = train_df.iloc[:4]
+    model = DecisionTreeClassifier(random_state=0)
+    model.fit(train_df.drop(columns="quality"), train_df["quality"])
+    importances = pd.DataFrame({"Feature": ["feature1", "feature2"], "Importance": [0.8, 0.2]})
+
+    bundle = build_report_data(train_df, train_df, test_df, model, importances, n_bins=5)
+
+    assert bundle["version"] == REPORT_DATA_VERSION
+    assert bundle["dataset"]["total_samples"] == 5
+    assert bundle["validation"]["duplicates_removed"] == 1
+    assert bundle["metrics"]["accuracy"] == 1.0
+    assert bundle["confusion"] == {"labels": [5, 6], "counts": [[2, 0], [0, 2]]}
+    assert sum(bundle["histograms"]["feature1"]["counts"]) == 6
+    json.dumps(bundle)
+
+
+def test_write_report_data(tmp_path):
+    """Test that an unchanged bundle leaves the file untouched."""
+    path = tmp_path / "report_data.json"
+
+    assert write_report_data({"version": 1, "a": 1}, str(path))
+    os.utime(path, (0, 0))
+    assert not write_report_data({"a": 1, "version": 1}, str(path))
+    assert os.path.getmtime(path) == 0
+    assert write_report_data({"version": 1, "a": 2}, str(path))
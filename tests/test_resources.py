@@ -0,0 +1,41 @@
+import json
+
+from joblib import effective_n_jobs
+from threadpoolctl import threadpool_info
+
+from src.resources import (
+    CPU_LIMIT_ENV,
+    STAGE_LIMITS,
+    available_cpus,
+    stage_limits,
+    stage_resources,
+)
+
+
+def test_stage_limits(monkeypatch):
+    """Test that stage limits never exceed the CPU budget set in the environment."""
+    monkeypatch.setenv(CPU_LIMIT_ENV, "1")
+    assert available_cpus() == 1
+    for stage in STAGE_LIMITS:
+        assert stage_limits(stage) == (1, 1)
+
+    monkeypatch.setenv(CPU_LIMIT_ENV, "10000")
+    n_jobs, threads = stage_limits("training")
+    assert threads == 1
+    assert n_jobs == available_cpus()
+    assert stage_limits("validation_batch") == (n_jobs, 1)
+
+
+def test_stage_resources(tmp_path, monkeypatch):
+    """Test that a stage caps joblib and BLAS threads and logs its usage."""
+    monkeypatch.setenv(CPU_LIMIT_ENV, "1")
+    log_path = tmp_path / "usage.jsonl"
+
+    with stage_resources("training", log_path=str(log_path)) as record:
+        assert effective_n_jobs(None) == 1
+        assert all(pool["num_threads"] == 1 for pool in threadpool_info())
+
+    logged = json.loads(log_path.read_text().splitlines()[0])
+    assert logged == record
+    assert logged["stage"] == "training"
+    assert {"wall_seconds", "cpu_seconds", "utilization"} <= set(logged)
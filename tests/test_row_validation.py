@@ -0,0 +1,61 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from src.row_validation import RowValidator, read_model_meta
+
+
+@pytest.fixture
+def X_train():
+    """Fixture for sample training features."""
+    return pd.DataFrame({
+        "fixed_acidity": [7.4, 7.8, 7.9],
+        "ph": [3.51, 3.20, 3.30],
+        "offset": [-1.0, 0.5, 2.0],
+    })
+
+
+def test_from_training(X_train):
+    """Test the bounds derived from the training data and from a schema spec."""
+    validator = RowValidator.from_training(X_train)
+    assert list(validator.lower) == [0.0, 0.0, -np.inf]
+    assert np.isinf(validator.upper).all()
+
+    spec = {"columns": {"ph": {"ge": 0, "le": 14}}}
+    validator = RowValidator.from_training(X_train, schema_spec=spec)
+    assert list(validator.upper) == [np.inf, 14, np.inf]
+
+
+def test_split(X_train):
+    """Test that bad rows are split out with a reason and columns are reordered."""
+    validator = RowValidator.from_training(X_train, {"columns": {"ph": {"ge": 0, "le": 14}}})
+    batch = pd.DataFrame({
+        "ph": [3.3, 15.0, np.nan, "abc"],
+        "extra": [1, 2, 3, 4],
+        "offset": [0.0, 0.0, 0.0, 0.0],
+        "fixed_acidity": [7.0, 7.0, 7.0, 7.0],
+    })
+
+    accepted, rejected = validator.split(batch)
+
+    assert list(accepted.columns) == list(X_train.columns)
+    assert len(accepted) == 1
+    assert list(rejected["reason"]) == [
+        "out of range ph",
+        "missing or non-numeric ph",
+        "missing or non-numeric ph",
+    ]
+    with pytest.raises(ValueError):
+        validator.split(batch.drop(columns="ph"))
+
+
+def test_save_and_load(X_train, tmp_path):
+    """Test that the validator round trips through the model metadata file."""
+    RowValidator.from_training(X_train).save(str(tmp_path))
+
+    loaded = RowValidator.load(os.path.join(str(tmp_path), "model.pkl"))
+
+    assert loaded.columns == list(X_train.columns)
+    assert read_model_meta(str(tmp_path))["schema"]["upper"] == [None, None, None]
+    accepted, rejected = loaded.split(X_train)
+    assert len(accepted) == 3 and rejected.empty
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+from sklearn.tree import DecisionTreeClassifier
+
+from src.seeding import (
+    DEFAULT_SEEDS,
+    stage_seed,
+    stage_seeds,
+    fingerprint_data,
+    fingerprint_tree,
+    compare_fingerprints,
+)
+
+
+def test_stage_seeds():
+    """Test that default seeds are kept and derived seeds are stable and distinct."""
+    assert stage_seeds() == DEFAULT_SEEDS
+    assert stage_seed("split") == 123
+    assert stage_seed("tree") == 16
+
+    seeds = stage_seeds(7)
+    assert seeds == stage_seeds(7)
+    assert len(set(seeds.values())) == len(seeds)
+    assert all(0 <= seed < 2**31 for seed in seeds.values())
+    assert seeds != stage_seeds(8)
+
+
+def test_fingerprints():
+    """Test that fingerprints change with the data and tree but not between refits."""
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(rng.random((50, 3)), columns=["a", "b", "c"])
+    y = (data["a"] > 0.5).astype(int)
+
+    assert fingerprint_data(data) == fingerprint_data(data.copy())
+    assert fingerprint_data(data) != fingerprint_data(data.iloc[::-1])
+
+    first = DecisionTreeClassifier(random_state=16).fit(data, y)
+    second = DecisionTreeClassifier(random_state=16).fit(data, y)
+    shallow = DecisionTreeClassifier(max_depth=1, random_state=16).fit(data, 1 - y)
+    assert fingerprint_tree(first) == fingerprint_tree(second)
+    assert fingerprint_tree(first) != fingerprint_tree(shallow)
+    assert compare_fingerprints({"tree": "x", "data": "y"}, {"tree": "x"}) == ["data"]
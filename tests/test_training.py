@@ -1,13 +1,22 @@
 import os
 import pytest
 import pandas as pd
+from sklearn.base import clone
+from sklearn.model_selection import RepeatedStratifiedKFold, cross_val_score
 from sklearn.tree import DecisionTreeClassifier
 import joblib
+import numpy as np
 from src.data_training import (
     read_data,
     train_model,
     load_model,
     perform_test,
+    bootstrap_metrics,
+    evaluate_with_ci,
+    compute_permutation_importance,
+    verify_model,
+    fit_model,
+    prune_model,
 )
 
 @pytest.fixture
@@ -58,10 +67,13 @@ def test_read_data(tmp_path):
     assert not df.empty
     assert list(df.columns) == ["col1", "col2"]
 
-def test_train_model(sample_train_data, tmp_path):
+def test_train_model(sample_train_data, tmp_path, monkeypatch):
     """Test the train_model function."""
     model_path = tmp_path / "model"
     os.makedirs(model_path, exist_ok=True)
+    monkeypatch.setattr("src.data_training.MODEL_PATH", str(model_path))
+    monkeypatch.setattr("src.data_training.FEATS_DATA_PATH", str(tmp_path / "feats.csv"))
+    monkeypatch.setattr("src.data_training.PRUNING_DATA_PATH", str(tmp_path / "pruning.csv"))
     trained_model_path = train_model(sample_train_data)
     assert os.path.exists(trained_model_path)
     model = joblib.load(trained_model_path)
@@ -75,8 +87,9 @@ def test_load_model(tmp_path):
     loaded_model = load_model(model_path)
     assert isinstance(loaded_model, DecisionTreeClassifier)
 
-def test_perform_test(sample_test_data, sample_train_data, tmp_path):
+def test_perform_test(sample_test_data, sample_train_data, tmp_path, monkeypatch):
     """Test the perform_test function."""
+    monkeypatch.setattr("src.data_training.REPORT_DATA_PATH", str(tmp_path / "report.csv"))
     model_path = tmp_path / "model.pkl"
     tree_model = DecisionTreeClassifier()
     tree_model.fit(sample_train_data.drop(columns="quality"), sample_train_data["quality"])
@@ -88,13 +101,103 @@ def test_perform_test(sample_test_data, sample_train_data, tmp_path):
     assert "precision" in report_df.columns
     assert "recall" in report_df.columns
 
-def test_end_to_end(sample_train_data, sample_test_data, tmp_path):
+def test_end_to_end(sample_train_data, sample_test_data, tmp_path, monkeypatch):
     """End-to-end test for training, saving, loading, and testing."""
     model_path = tmp_path / "model"
     os.makedirs(model_path, exist_ok=True)
+    monkeypatch.setattr("src.data_training.MODEL_PATH", str(model_path))
+    monkeypatch.setattr("src.data_training.FEATS_DATA_PATH", str(tmp_path / "feats.csv"))
+    monkeypatch.setattr("src.data_training.PRUNING_DATA_PATH", str(tmp_path / "pruning.csv"))
+    monkeypatch.setattr("src.data_training.REPORT_DATA_PATH", str(tmp_path / "report.csv"))
     trained_model_path = train_model(sample_train_data)
 
     model = load_model(trained_model_path)
     report_df = perform_test(sample_test_data, model)
     assert not report_df.empty
-    assert "f1-score" in report_df.columns
\ No newline at end of file
+    assert "f1-score" in report_df.columns
+
+def test_bootstrap_metrics():
+    """Test that bootstrap_metrics is vectorized, bounded and independent of n_jobs."""
+    rng = np.random.default_rng(0)
+    y_true = rng.integers(3, 9, size=500)
+    y_pred = np.where(rng.random(500) < 0.7, y_true, rng.integers(3, 9, size=500))
+
+    labels, accuracy, f1 = bootstrap_metrics(y_true, y_pred, n_boot=300, n_jobs=1)
+    _, accuracy_par, f1_par = bootstrap_metrics(y_true, y_pred, n_boot=300, n_jobs=2)
+
+    assert list(labels) == [3, 4, 5, 6, 7, 8]
+    assert accuracy.shape == (300,) and f1.shape == (300, 6)
+    assert abs(accuracy.mean() - (y_true == y_pred).mean()) < 0.02
+    assert np.array_equal(accuracy, accuracy_par) and np.array_equal(f1, f1_par)
+
+def test_evaluate_with_ci(sample_train_data, sample_test_data, tmp_path, monkeypatch):
+    """Test that evaluate_with_ci reports intervals that contain the estimates."""
+    monkeypatch.setattr("src.data_training.EVAL_DATA_PATH", str(tmp_path / "ci.csv"))
+    model = DecisionTreeClassifier(random_state=0)
+    model.fit(sample_train_data.drop(columns="quality"), sample_train_data["quality"])
+
+    ci_df = evaluate_with_ci(
+        sample_test_data, model, train_df=sample_train_data, n_boot=200, n_splits=2
+    )
+
+    assert list(ci_df["Metric"]) == ["accuracy", "f1_5", "f1_6", "cv_accuracy"]
+    assert (ci_df["Lower"] <= ci_df["Estimate"]).all()
+    assert (ci_df["Estimate"] <= ci_df["Upper"]).all()
+    assert os.path.exists(tmp_path / "ci.csv")
+
+
+def test_evaluate_with_ci_cv_mean(sample_train_data, sample_test_data, tmp_path, monkeypatch):
+    """Test that the cv_accuracy interval is the bootstrap interval of the fold mean."""
+    monkeypatch.setattr("src.data_training.EVAL_DATA_PATH", str(tmp_path / "ci.csv"))
+    model = DecisionTreeClassifier(random_state=0)
+    X, y = sample_train_data.drop(columns="quality"), sample_train_data["quality"]
+    model.fit(X, y)
+
+    ci_df = evaluate_with_ci(
+        sample_test_data, model, train_df=sample_train_data, n_boot=500, n_splits=2, n_repeats=10
+    )
+    cv_scores = cross_val_score(
+        clone(model), X, y, scoring="accuracy",
+        cv=RepeatedStratifiedKFold(n_splits=2, n_repeats=10, random_state=123),
+    )
+
+    cv_row = ci_df.set_index("Metric").loc["cv_accuracy"]
+    fold_range = np.quantile(cv_scores, 0.975) - np.quantile(cv_scores, 0.025)
+    assert cv_row["Upper"] - cv_row["Lower"] < fold_range
+
+def test_compute_permutation_importance(sample_train_data, sample_test_data, tmp_path, monkeypatch):
+    """Test that permutation importance covers every feature and stops early."""
+    monkeypatch.setattr("src.data_training.PERM_FEATS_DATA_PATH", str(tmp_path / "perm.csv"))
+    model = DecisionTreeClassifier(random_state=0)
+    model.fit(sample_train_data.drop(columns="quality"), sample_train_data["quality"])
+
+    perm_df = compute_permutation_importance(
+        sample_test_data, model, repeats_per_round=2, max_repeats=40, n_jobs=2
+    )
+
+    assert set(perm_df["Feature"]) == set(sample_test_data.columns.drop("quality"))
+    assert perm_df["Importance"].is_monotonic_decreasing
+    assert perm_df["Repeats"].iloc[0] < 40
+    assert os.path.exists(tmp_path / "perm.csv")
+
+def test_verify_model(sample_train_data, tmp_path, monkeypatch):
+    """Test that verify_model accepts a reproduced model and rejects changed data."""
+    monkeypatch.setattr("src.data_training.MODEL_PATH", str(tmp_path))
+    monkeypatch.setattr("src.data_training.FEATS_DATA_PATH", str(tmp_path / "feats.csv"))
+    monkeypatch.setattr("src.data_training.PRUNING_DATA_PATH", str(tmp_path / "pruning.csv"))
+    train_model(sample_train_data, root_seed=7)
+
+    assert verify_model(sample_train_data, model_dir=str(tmp_path)) == []
+    changed = sample_train_data.assign(alcohol=sample_train_data["alcohol"] + 1)
+    assert "saved model data" in verify_model(changed, model_dir=str(tmp_path))
+
+def test_prune_model(sample_train_data):
+    """Test that pruning keeps the smallest tree within tolerance of the best."""
+    model = fit_model(sample_train_data, n_jobs=1)
+    pruned, pruning_df = prune_model(model, sample_train_data, tolerance=0.05, n_jobs=1)
+
+    assert {"Alpha", "Accuracy", "Nodes", "Depth", "Bytes", "Latency"} <= set(pruning_df.columns)
+    assert pruning_df["Selected"].sum() == 1
+    selected = pruning_df[pruning_df["Selected"]].iloc[0]
+    assert selected["Accuracy"] >= pruning_df["Accuracy"].max() - 0.05
+    assert pruned.tree_.node_count == selected["Nodes"] <= model.tree_.node_count
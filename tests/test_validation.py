@@ -2,8 +2,25 @@ import os
 import pandas as pd
 import numpy as np
 import tempfile
+import pytest
 
-from src.validation import clean_data, split_data
+from src.validation import (
+    clean_data,
+    split_data,
+    reservoir_sample,
+    approx_corr_feats,
+    has_duplicate_rows,
+    infer_schema_spec,
+    build_schema,
+    validate_processed_data,
+    partition_stats,
+    merge_stats,
+    validate_stats,
+    process_store,
+    run_batch,
+)
+from src.data_download import BATCH_FILE_NAME
+from src.raw_store import RawStore
 
 def test_clean_data():
     """
@@ -57,4 +74,139 @@ def test_split_data():
             
         finally:
             # Restore the original PROCESSED_FOLDER_PATH
-            split_data.__globals__['PROCESSED_FOLDER_PATH'] = original_processed_folder
\ No newline at end of file
+            split_data.__globals__['PROCESSED_FOLDER_PATH'] = original_processed_folder
+
+def test_reservoir_sample():
+    """
+    Test that reservoir_sample keeps the requested number of distinct rows from a stream.
+    """
+    rows = np.arange(1000, dtype=float).reshape(-1, 1)
+    chunks = [rows[i:i + 128] for i in range(0, 1000, 128)]
+
+    sample = reservoir_sample(chunks, 50, random_state=1)
+
+    assert sample.shape == (50, 1)
+    assert len(np.unique(sample)) == 50
+    assert len(reservoir_sample([rows[:10]], 50)) == 10
+
+
+def test_approx_corr_feats():
+    """
+    Test the approximate correlation check against the exact check_corr_feats.
+    """
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=50_000)
+    independent = pd.DataFrame({'a': x, 'b': rng.normal(size=50_000)})
+    correlated = pd.DataFrame({'a': x, 'b': x + rng.normal(scale=0.01, size=50_000)})
+
+    assert approx_corr_feats(independent, sample_size=2000) == (True, False)
+    assert approx_corr_feats(correlated, sample_size=2000) == (False, False)
+    assert approx_corr_feats(independent, sample_size=100_000) == (True, True)
+
+
+def test_has_duplicate_rows():
+    """
+    Test that the hashed duplicate check agrees with DataFrame.duplicated.
+    """
+    data = pd.DataFrame({'a': [1.0, 2.0, 1.0, -0.0], 'b': [3.0, 4.0, 3.0, 0.0]})
+
+    assert has_duplicate_rows(data)
+    assert not has_duplicate_rows(data.drop_duplicates())
+
+
+def test_infer_schema_spec():
+    """
+    Test that an inferred schema accepts its own data and rejects invalid rows.
+    """
+    data = pd.DataFrame({
+        'feature1': [0.5, 1.5, 2.5, 3.5],
+        'feature2': [-1.0, 0.0, 1.0, 2.0],
+        'target': [0, 1, 0, 1],
+    })
+
+    spec = infer_schema_spec(data, target='target')
+
+    assert spec['columns']['feature1']['ge'] == 0
+    assert 'ge' not in spec['columns']['feature2']
+    assert spec['columns']['target'] == {'dtype': 'int', 'ge': 0, 'isin': [0, 1]}
+    build_schema(spec).validate(data)
+    assert not validate_processed_data(data.assign(target=[0, 1, 2, 1]), schema_spec=spec)
+
+
+def test_merge_stats():
+    """Test that merged partition statistics match statistics of the whole data."""
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(rng.normal(size=(300, 3)), columns=["a", "b", "c"])
+    data["quality"] = rng.integers(3, 9, size=300)
+
+    merged = merge_stats(partition_stats(data.iloc[:120]), partition_stats(data.iloc[120:]))
+    whole = partition_stats(data)
+
+    assert merged["rows"] == whole["rows"] == 300
+    assert merged["min"] == whole["min"] and merged["max"] == whole["max"]
+    assert merged["levels"]["quality"] == whole["levels"]["quality"]
+    assert np.allclose(merged["comoment"], whole["comoment"])
+    assert np.allclose(merged["mean"], whole["mean"])
+
+
+def test_process_store(tmp_path):
+    """Test that only new store partitions are split and the stats agree with pandera."""
+    raw = pd.read_csv("data/raw/wine_quality_combined.csv")
+    store = RawStore(str(tmp_path / "store"))
+    processed, report = str(tmp_path / "processed"), str(tmp_path / "report")
+
+    store.ingest(raw.iloc[:3000])
+    assert process_store(store.root, processed, report)
+    store.ingest(raw)
+    assert process_store(store.root, processed, report)
+
+    train = pd.read_csv(os.path.join(processed, "wine_train.csv"))
+    test = pd.read_csv(os.path.join(processed, "wine_test.csv"))
+    clean = clean_data(raw)
+    assert len(train) + len(test) == len(clean)
+    assert validate_stats(partition_stats(clean)) == validate_processed_data(clean)
+
+
+def test_run_batch(tmp_path):
+    """Test that datasets are processed in worker processes into per-id folders."""
+    raw = pd.read_csv("data/raw/wine_quality_combined.csv")
+    for data_id, rows in [(186, raw), (1, raw.iloc[:2000])]:
+        os.makedirs(tmp_path / "raw" / str(data_id))
+        rows.to_csv(tmp_path / "raw" / str(data_id) / BATCH_FILE_NAME, index=False)
+
+    results = run_batch(
+        str(tmp_path / "raw"), str(tmp_path / "processed"), str(tmp_path / "report"), [186, 1],
+        max_workers=2,
+    )
+
+    assert set(results) == {186, 1}
+    for data_id in results:
+        assert os.path.exists(tmp_path / "processed" / str(data_id) / "wine_train.csv")
+
+
+def test_process_store_retry(tmp_path, monkeypatch):
+    """Test that a run failing on drift or on the cache write is retried without duplicates."""
+    raw = pd.read_csv("data/raw/wine_quality_combined.csv")
+    store = RawStore(str(tmp_path / "store"))
+    processed, report = str(tmp_path / "processed"), str(tmp_path / "report")
+    store.ingest(raw.iloc[:3000])
+    process_store(store.root, processed, report)
+    store.ingest(raw)
+
+    def fail(*args, **kwargs):
+        raise ValueError("drift")
+
+    with monkeypatch.context() as m:
+        m.setattr("src.validation.validate_data_distribution", fail)
+        with pytest.raises(ValueError):
+            process_store(store.root, processed, report)
+    with monkeypatch.context() as m:
+        m.setattr("src.validation.json.dump", fail)
+        with pytest.raises(ValueError):
+            process_store(store.root, processed, report)
+    process_store(store.root, processed, report)
+
+    train = pd.read_csv(os.path.join(processed, "wine_train.csv"))
+    test = pd.read_csv(os.path.join(processed, "wine_test.csv"))
+    assert len(train) + len(test) == len(clean_data(raw))
+    assert not train.duplicated().any()